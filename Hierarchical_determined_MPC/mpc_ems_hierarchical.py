@@ -1,12 +1,19 @@
 # file: mpc_ems_hierarchical.py (Final Numerically Stable Version V6.0)
-# Note: This version separates the lower-level optimization into two distinct problems
-# to resolve the numerical instability caused by vastly different asset capacities.
+# Note: The lower level keeps a separately weighted tracking residual for the smoothing and the
+# power assets, which resolves the numerical instability caused by vastly different asset
+# capacities; both residuals are minimized in a single problem.
 
 import cvxpy as cp
 import numpy as np
 
+from mpc_common import configure_cvxpy_threads, create_gurobi_env, shift_warm_start, solve_in_order
+
 
 class HierarchicalMPCEms:
+    # Move blocking for the upper level: slow assets hold their charge/discharge power constant over
+    # blocks of this many upper-level steps, which cuts their decision variables by the same factor.
+    UPPER_MOVE_BLOCKING = {'phs': 4, 'caes': 4, 'hes': 2, 'tes': 2}
+
     def __init__(self, hess_system, upper_horizon, lower_horizon):
         self.hess = hess_system
         self.PH_upper = upper_horizon
@@ -16,32 +23,81 @@ class HierarchicalMPCEms:
         self.smoothing_assets = [u for u in self.hess.all_units.values() if 'ees' in u.id]
         self.power_assets = [u for u in self.hess.all_units.values() if
                              any(keyword in u.id for keyword in ['fw', 'sc', 'smes'])]
+        # Capacity is static, so the zero-capacity check is done once here: assets without usable
+        # capacity keep a constant SOC and need no dynamics in the upper-level problem.
+        self.energy_assets_active = [u for u in self.energy_assets if u.capacity_mwh > 1e-6]
+        self.energy_assets_static = [u for u in self.energy_assets if u.capacity_mwh <= 1e-6]
 
-    def solve_with_fallback(self, problem):
-        try:
-            problem.solve(solver=cp.GUROBI, verbose=False)  # Set verbose=False for final run
-            if problem.status not in ["optimal", "optimal_inaccurate"]:
-                raise cp.error.SolverError("GUROBI failed or did not find an optimal solution.")
+        configure_cvxpy_threads()
+        self._gurobi_env = create_gurobi_env()
+        self._build_upper_problem()
+        self._build_lower_problem()
+
+    def solve_with_fallback(self, problem, warm_start=False, use_gurobi=True, keep_warm_start=()):
+        """
+        Solves with GUROBI (only when use_gurobi is set, reusing the cached env), then ECOS, and returns
+        whether an optimal solution was found. Variables in keep_warm_start are warm-started with their
+        previous values instead of being shifted by one step.
+        """
+        if warm_start:
+            shift_warm_start(problem, skip=keep_warm_start)
+        attempts = []
+        if use_gurobi:
+            attempts.append((cp.GUROBI, {"env": self._gurobi_env} if self._gurobi_env is not None else {}))
+        attempts.append((cp.ECOS, {"max_iters": 500, "abstol": 1e-6}))
+        if solve_in_order(problem, attempts, warm_start=warm_start):
             return True
-        except (cp.error.SolverError, ImportError, AttributeError):
-            try:
-                problem.solve(solver=cp.ECOS, verbose=False, max_iters=500, abstol=1e-6)
-                if problem.status not in ["optimal", "optimal_inaccurate"]:
-                    raise cp.error.SolverError("ECOS failed or did not find an optimal solution.")
-                return True
-            except cp.error.SolverError as e:
-                print(f"Warning: All solvers failed. Final problem status: {problem.status}, Error: {e}")
-                return False
+        print(f"Warning: All solvers failed. Final problem status: {problem.status}")
+        return False
 
-    def solve_upper_level(self, current_soc, grid_prices_upper, slow_task_signal_upper):
-        # This function remains unchanged and is already working correctly.
-        p_charge_upper_dc = {unit.id: cp.Variable(self.PH_upper, nonneg=True) for unit in self.energy_assets}
-        p_discharge_upper_dc = {unit.id: cp.Variable(self.PH_upper, nonneg=True) for unit in self.energy_assets}
-        soc_vars_upper = {unit.id: cp.Variable(self.PH_upper + 1) for unit in self.energy_assets}
+    @staticmethod
+    def _total_dispatch_ac(assets, p_dis_dc, p_ch_dc):
+        """
+        Total AC-side dispatch of a group of assets, summed over a stacked (n_assets, horizon) matrix
+        rather than a Python list of per-asset expressions.
+        """
+        eff = np.array([u.efficiency for u in assets])[:, None]
+        p_dis = cp.vstack([p_dis_dc[u.id] for u in assets])
+        p_ch = cp.vstack([p_ch_dc[u.id] for u in assets])
+        return cp.sum(cp.multiply(p_dis, eff) - cp.multiply(p_ch, 1 / eff), axis=0)
+
+    def _blocked_upper_variable(self, unit):
+        """
+        Upper-level power variable of one slow asset with move blocking: one variable per block,
+        expanded back to the full horizon by indexing. The per-block variables are recorded in
+        self._blocked_upper_vars: one element spans several steps, so a one-step warm-start shift
+        would move the plan forward by a whole block.
+        """
+        block = next((b for keyword, b in self.UPPER_MOVE_BLOCKING.items() if keyword in unit.id), 1)
+        if block <= 1:
+            return cp.Variable(self.PH_upper, nonneg=True)
+        n_blocks = -(-self.PH_upper // block)
+        blocked = cp.Variable(n_blocks, nonneg=True)
+        self._blocked_upper_vars.append(blocked)
+        return blocked[np.arange(self.PH_upper) // block]
+
+    @staticmethod
+    def _soc_trajectory(soc_param, p_ch_dc, p_dis_dc, dt_h, capacity_mwh):
+        """
+        SOC at the end of each step as an affine expression of the initial SOC and the cumulative
+        energy exchanged, so no SOC variables or step-to-step equality constraints are needed.
+        """
+        return soc_param + cp.cumsum(p_ch_dc - p_dis_dc) * (dt_h / capacity_mwh)
+
+    def _build_upper_problem(self):
+        # Built once: only the parameter values change between 15-minute calls,
+        # so CVXPY does not have to re-parse and re-canonicalize the problem.
+        self._soc_param = {unit.id: cp.Parameter() for unit in self.energy_assets}
+        self._price_param = cp.Parameter(self.PH_upper)
+        self._slow_task_param = cp.Parameter(self.PH_upper)
+
+        self._blocked_upper_vars = []
+        p_charge_upper_dc = {unit.id: self._blocked_upper_variable(unit) for unit in self.energy_assets}
+        p_discharge_upper_dc = {unit.id: self._blocked_upper_variable(unit) for unit in self.energy_assets}
         grid_exchange = cp.Variable(self.PH_upper)
 
         dt_upper_h = (15 * 60) / 3600.0
-        grid_cost = cp.sum(cp.multiply(grid_exchange, grid_prices_upper)) * dt_upper_h
+        grid_cost = cp.sum(cp.multiply(grid_exchange, self._price_param)) * dt_upper_h
         total_om_cost = 0
         for unit in self.energy_assets:
             power_ac_discharge = p_discharge_upper_dc[unit.id] * unit.efficiency
@@ -51,111 +107,126 @@ class HierarchicalMPCEms:
         objective = cp.Minimize(grid_cost + total_om_cost)
 
         constraints = []
-        total_slow_dispatch_ac = cp.sum([
-            p_discharge_upper_dc[u.id] * u.efficiency - p_charge_upper_dc[u.id] / u.efficiency
-            for u in self.energy_assets
-        ]) if self.energy_assets else 0
+        total_slow_dispatch_ac = self._total_dispatch_ac(
+            self.energy_assets, p_discharge_upper_dc, p_charge_upper_dc) if self.energy_assets else 0
 
-        constraints.append(slow_task_signal_upper == total_slow_dispatch_ac + grid_exchange)
+        constraints.append(self._slow_task_param == total_slow_dispatch_ac + grid_exchange)
 
-        for unit in self.energy_assets:
+        # Assets without usable capacity (energy_assets_static) keep their current SOC over the
+        # whole horizon, so only the active ones get SOC bounds.
+        for unit in self.energy_assets_active:
             uid = unit.id
-            for t in range(self.PH_upper):
-                energy_change_mwh = (p_charge_upper_dc[uid][t] - p_discharge_upper_dc[uid][t]) * dt_upper_h
-                if unit.capacity_mwh > 1e-6:
-                    constraints.append(
-                        soc_vars_upper[uid][t + 1] == soc_vars_upper[uid][t] + energy_change_mwh / unit.capacity_mwh)
-                else:
-                    constraints.append(soc_vars_upper[uid][t + 1] == soc_vars_upper[uid][t])
+            soc_upper = self._soc_trajectory(self._soc_param[uid], p_charge_upper_dc[uid],
+                                             p_discharge_upper_dc[uid], dt_upper_h, unit.capacity_mwh)
+            constraints.extend([soc_upper >= unit.soc_min, soc_upper <= unit.soc_max])
 
+        for unit in self.energy_assets:
+            uid = unit.id
             constraints.append(p_discharge_upper_dc[uid] * unit.efficiency <= unit.power_m_w)
             constraints.append(p_charge_upper_dc[uid] <= unit.power_m_w * unit.efficiency)
-            constraints.append(soc_vars_upper[uid][0] == current_soc[uid])
-            constraints.extend([soc_vars_upper[uid] >= unit.soc_min, soc_vars_upper[uid] <= unit.soc_max])
-
-        problem = cp.Problem(objective, constraints)
-        if self.solve_with_fallback(problem):
-            dispatch_ac = {unit.id: (p_discharge_upper_dc[unit.id].value * unit.efficiency) - (
-                    p_charge_upper_dc[unit.id].value / unit.efficiency) for unit in self.energy_assets}
-            return {"status": "optimal", "dispatch": dispatch_ac, "grid_exchange": grid_exchange.value}
+
+        self._p_charge_upper_dc = p_charge_upper_dc
+        self._p_discharge_upper_dc = p_discharge_upper_dc
+        self._grid_exchange = grid_exchange
+        self._upper_problem = cp.Problem(objective, constraints)
+
+    def _build_lower_group(self, assets, task_param, soc_params):
+        """
+        Builds the variables, tracking residual and constraints for one group of lower-level assets.
+        """
+        p_ch_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in assets}
+        p_dis_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in assets}
+
+        total_dispatch_ac = self._total_dispatch_ac(assets, p_dis_dc, p_ch_dc)
+
+        constraints = []
+        dt_h = self.hess.dt_s / 3600
+        for unit in assets:
+            uid = unit.id
+            soc = self._soc_trajectory(soc_params[uid], p_ch_dc[uid], p_dis_dc[uid], dt_h, unit.capacity_mwh)
+
+            constraints.append(p_dis_dc[uid] * unit.efficiency <= unit.power_m_w)
+            constraints.append(p_ch_dc[uid] <= unit.power_m_w * unit.efficiency)
+            constraints.extend([soc >= unit.soc_min, soc <= unit.soc_max])
+
+        return total_dispatch_ac - task_param, constraints, p_ch_dc, p_dis_dc
+
+    def _build_lower_problem(self):
+        # The smoothing and power groups share no variables, so one problem with a separately
+        # weighted residual per group has the same solution as two problems, at one solve per tick.
+        # The per-group problems are kept as a fallback for ticks where the merged problem fails.
+        self._lower_soc_param = {u.id: cp.Parameter() for u in self.smoothing_assets + self.power_assets}
+        self._mid_task_param = cp.Parameter(self.PH_lower)
+        self._high_task_param = cp.Parameter(self.PH_lower)
+        self._p_ch_lower_dc, self._p_dis_lower_dc = {}, {}
+        self._lower_group_problems = []
+
+        objective_terms, constraints = [], []
+        for assets, task_param, weight in ((self.smoothing_assets, self._mid_task_param, 100),
+                                           (self.power_assets, self._high_task_param, 1000)):
+            if not assets:
+                continue
+            residual, group_constraints, p_ch_dc, p_dis_dc = self._build_lower_group(
+                assets, task_param, self._lower_soc_param)
+            # norm2 has the same minimizer as sum_squares but canonicalizes to a single SOC constraint
+            group_objective = weight * cp.norm2(residual)
+            objective_terms.append(group_objective)
+            constraints.extend(group_constraints)
+            self._lower_group_problems.append((assets, cp.Problem(cp.Minimize(group_objective), group_constraints)))
+            self._p_ch_lower_dc.update(p_ch_dc)
+            self._p_dis_lower_dc.update(p_dis_dc)
+
+        self._lower_problem = cp.Problem(cp.Minimize(cp.sum(objective_terms)), constraints) \
+            if objective_terms else None
+
+    def solve_upper_level(self, current_soc, grid_prices_upper, slow_task_signal_upper):
+        for uid, param in self._soc_param.items():
+            param.value = current_soc[uid]
+        self._price_param.value = np.asarray(grid_prices_upper, dtype=float)
+        self._slow_task_param.value = np.asarray(slow_task_signal_upper, dtype=float)
+
+        if self.solve_with_fallback(self._upper_problem, warm_start=True,
+                                    keep_warm_start=self._blocked_upper_vars):
+            dispatch_ac = {unit.id: (self._p_discharge_upper_dc[unit.id].value * unit.efficiency) - (
+                    self._p_charge_upper_dc[unit.id].value / unit.efficiency) for unit in self.energy_assets}
+            return {"status": "optimal", "dispatch": dispatch_ac, "grid_exchange": self._grid_exchange.value}
         else:
             return {"status": "failed", "dispatch": {}, "grid_exchange": np.zeros(self.PH_upper)}
 
     def solve_lower_level(self, current_soc, mid_task_signal, high_task_signal):
         """
-        Main modification: This function now coordinates two separate, smaller optimizations.
+        Tracks the mid-frequency signal with the smoothing assets (e.g., ees) and the high-frequency
+        signal with the power assets (e.g., fw, sc, smes) in a single optimization.
         """
-        final_dispatch = {}
+        lower_assets = self.smoothing_assets + self.power_assets
+        if self._lower_problem is None:
+            return {}
 
-        # --- Optimization 1: Smoothing Assets (e.g., ees) for Mid-Frequency Signal ---
+        for uid, param in self._lower_soc_param.items():
+            param.value = current_soc[uid]
         if self.smoothing_assets:
-            p_ch_smooth_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.smoothing_assets}
-            p_dis_smooth_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.smoothing_assets}
-            soc_smooth = {u.id: cp.Variable(self.PH_lower + 1) for u in self.smoothing_assets}
-
-            total_smooth_dispatch_ac = cp.sum(
-                [p_dis_smooth_dc[u.id] * u.efficiency - p_ch_smooth_dc[u.id] / u.efficiency for u in
-                 self.smoothing_assets]
-            )
-
-            objective_mid = cp.Minimize(100 * cp.sum_squares(total_smooth_dispatch_ac - mid_task_signal))
-
-            constraints_mid = []
-            dt_h = self.hess.dt_s / 3600
-            for unit in self.smoothing_assets:
-                uid = unit.id
-                for t in range(self.PH_lower):
-                    energy_change_mwh = (p_ch_smooth_dc[uid][t] - p_dis_smooth_dc[uid][t]) * dt_h
-                    constraints_mid.append(
-                        soc_smooth[uid][t + 1] == soc_smooth[uid][t] + energy_change_mwh / unit.capacity_mwh)
-
-                constraints_mid.append(p_dis_smooth_dc[uid] * unit.efficiency <= unit.power_m_w)
-                constraints_mid.append(p_ch_smooth_dc[uid] <= unit.power_m_w * unit.efficiency)
-                constraints_mid.append(soc_smooth[uid][0] == current_soc[uid])
-                constraints_mid.extend([soc_smooth[uid] >= unit.soc_min, soc_smooth[uid] <= unit.soc_max])
-
-            problem_mid = cp.Problem(objective_mid, constraints_mid)
-            if self.solve_with_fallback(problem_mid):
-                for unit in self.smoothing_assets:
-                    dispatch_ac = (p_dis_smooth_dc[unit.id].value[0] * unit.efficiency) - (
-                                p_ch_smooth_dc[unit.id].value[0] / unit.efficiency)
-                    final_dispatch[unit.id] = dispatch_ac if dispatch_ac is not None else 0
-            else:
-                for unit in self.smoothing_assets: final_dispatch[unit.id] = 0
-
-        # --- Optimization 2: Power Assets (e.g., fw, sc, smes) for High-Frequency Signal ---
+            self._mid_task_param.value = np.asarray(mid_task_signal, dtype=float)
         if self.power_assets:
-            p_ch_power_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.power_assets}
-            p_dis_power_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.power_assets}
-            soc_power = {u.id: cp.Variable(self.PH_lower + 1) for u in self.power_assets}
-
-            total_power_dispatch_ac = cp.sum(
-                [p_dis_power_dc[u.id] * u.efficiency - p_ch_power_dc[u.id] / u.efficiency for u in self.power_assets]
-            )
-
-            objective_high = cp.Minimize(1000 * cp.sum_squares(total_power_dispatch_ac - high_task_signal))
-
-            constraints_high = []
-            dt_h = self.hess.dt_s / 3600
-            for unit in self.power_assets:
-                uid = unit.id
-                for t in range(self.PH_lower):
-                    energy_change_mwh = (p_ch_power_dc[uid][t] - p_dis_power_dc[uid][t]) * dt_h
-                    constraints_high.append(
-                        soc_power[uid][t + 1] == soc_power[uid][t] + energy_change_mwh / unit.capacity_mwh)
-
-                constraints_high.append(p_dis_power_dc[uid] * unit.efficiency <= unit.power_m_w)
-                constraints_high.append(p_ch_power_dc[uid] <= unit.power_m_w * unit.efficiency)
-                constraints_high.append(soc_power[uid][0] == current_soc[uid])
-                constraints_high.extend([soc_power[uid] >= unit.soc_min, soc_power[uid] <= unit.soc_max])
-
-            problem_high = cp.Problem(objective_high, constraints_high)
-            if self.solve_with_fallback(problem_high):
-                for unit in self.power_assets:
-                    dispatch_ac = (p_dis_power_dc[unit.id].value[0] * unit.efficiency) - (
-                                p_ch_power_dc[unit.id].value[0] / unit.efficiency)
-                    final_dispatch[unit.id] = dispatch_ac if dispatch_ac is not None else 0
+            self._high_task_param.value = np.asarray(high_task_signal, dtype=float)
+
+        final_dispatch = {}
+        # The small lower-level problem is solved every tick; Gurobi's licensing and startup
+        # latency outweigh its benefit here, so it goes straight to the conic solver.
+        if self.solve_with_fallback(self._lower_problem, warm_start=True, use_gurobi=False):
+            solved_assets = lower_assets
+        else:
+            # Re-solve each group on its own, so a failure in one group does not zero the other.
+            solved_assets = []
+            for assets, group_problem in self._lower_group_problems:
+                if self.solve_with_fallback(group_problem, use_gurobi=False):
+                    solved_assets.extend(assets)
+
+        for unit in lower_assets:
+            if unit in solved_assets:
+                dispatch_ac = (self._p_dis_lower_dc[unit.id].value[0] * unit.efficiency) - (
+                            self._p_ch_lower_dc[unit.id].value[0] / unit.efficiency)
+                final_dispatch[unit.id] = dispatch_ac if dispatch_ac is not None else 0
             else:
-                for unit in self.power_assets: final_dispatch[unit.id] = 0
+                final_dispatch[unit.id] = 0
 
-        return final_dispatch
\ No newline at end of file
+        return final_dispatch
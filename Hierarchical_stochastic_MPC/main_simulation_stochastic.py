@@ -5,11 +5,11 @@ import os
 os.environ['OMP_NUM_THREADS'] = '4'
 import numpy as np
 import matplotlib.pyplot as plt
-import pywt
 import pandas as pd
 from tqdm import tqdm
 # 导入所有必要的模块
 from hess_system import HybridEnergyStorageSystem
+from mpc_common import decompose_power_signal, forecast_windows, optional_jit, resample_upper_plan
 from Hierarchical_stochastic_MPC.mpc_ems_stochastic import HierarchicalMPCEms
 from scenario_generation import generate_scenarios
 
@@ -32,81 +32,33 @@ plt.rcParams['axes.unicode_minus'] = False
 
 
 # =============================================================================
-# 1. 核心工具函数：小波包分解
+# 1. 数据生成函数 (单位: W)
 # =============================================================================
-def decompose_power_signal(power_signal, wavelet='db4', level=3):
-    """
-    使用小波包变换将功率信号分解为不同频段的子信号。
-    """
-    power_signal = np.asarray(power_signal)
-    original_len = len(power_signal)
-
-    # 执行完整的小波包分解
-    wp_full = pywt.WaveletPacket(data=power_signal, wavelet=wavelet, mode='symmetric', maxlevel=level)
-
-    # 获取按频率排序的所有最深层的节点路径
-    nodes = wp_full.get_level(level, order='freq')
-    node_paths = [str(node.path) for node in nodes]
-
-    # 增强鲁棒性：验证节点数量
-    expected_node_count = 2 ** level
-    if len(node_paths) != expected_node_count:
-        if original_len < expected_node_count:
-            print(f"警告: 信号长度({original_len})不足以支持{level}层分解，将返回零信号。")
-            return {"low": np.zeros(original_len), "mid": np.zeros(original_len), "high": np.zeros(original_len)}
-        else:
-            raise ValueError(f"小波包分解节点数量异常！预期 {expected_node_count}，实际 {len(node_paths)}")
-
-    # 定义频带分配
-    low_freq_paths = node_paths[:2]
-    mid_freq_paths = node_paths[2:4]
-    high_freq_paths = node_paths[4:]
-
-    # 通过系数筛选和重构，生成各频带信号
-    def reconstruct_from_paths(full_wp, target_paths, max_level):
-        temp_wp = pywt.WaveletPacket(data=None, wavelet=wavelet, mode='symmetric', maxlevel=max_level)
-        for path_str in target_paths:
-            try:
-                temp_wp[path_str] = full_wp[path_str].data
-            except TypeError:
-                path_tuple = tuple(path_str)
-                if path_tuple in full_wp:
-                    temp_wp[path_tuple] = full_wp[path_tuple].data
-        return temp_wp.reconstruct(update=False)
-
-    low_freq_signal = reconstruct_from_paths(wp_full, low_freq_paths, level)
-    mid_freq_signal = reconstruct_from_paths(wp_full, mid_freq_paths, level)
-    high_freq_signal = reconstruct_from_paths(wp_full, high_freq_paths, level)
-
-    # 裁剪信号以匹配原始长度
-    return {
-        "low": low_freq_signal[:original_len],
-        "mid": mid_freq_signal[:original_len],
-        "high": high_freq_signal[:original_len]
-    }
-
-
-# =============================================================================
-# 2. 数据生成函数 (单位: W)
-# =============================================================================
-def generate_wind_power_data(duration_s, dt_s):
+# 数据生成函数只使用 Numba 支持的 NumPy 子集，由 optional_jit 在安装了 numba 时 JIT 编译
+# (逐元素表达式融合为单个循环，不再生成中间数组)。
+# 注意：JIT 编译后 np.random 使用 numba 自己的随机数状态，在 Python 侧调用 np.random.seed 对其无效；
+# 需要可复现的数据时，通过 seed 参数在函数内部设定种子 (有无 numba 时生成的序列相同)。
+@optional_jit
+def generate_wind_power_data(duration_s, dt_s, seed=None):
+    if seed is not None:
+        np.random.seed(seed)
     time_series = np.arange(0, duration_s, dt_s)
-    base_wind = 5e6 * (np.sin(2 * np.pi * time_series / 86400) + 1.5)
-    noise = 1e6 * np.random.randn(len(time_series))
-    raw_wind_fine = base_wind + noise
-    raw_wind_fine[raw_wind_fine < 0] = 0
+    raw_wind_fine = 5e6 * (np.sin(2 * np.pi * time_series / 86400) + 1.5) + np.random.normal(0.0, 1e6, len(time_series))
+    raw_wind_fine = np.maximum(raw_wind_fine, 0.0)
     downsample_ratio = int(900 / dt_s)
     raw_wind_upper = raw_wind_fine[::downsample_ratio]
     return raw_wind_fine, raw_wind_upper
 
 
-def generate_solar_power_data(duration_s, dt_s):
+@optional_jit
+def generate_solar_power_data(duration_s, dt_s, seed=None):
+    if seed is not None:
+        np.random.seed(seed)
     time_series = np.arange(0, duration_s, dt_s)
     solar_noon = duration_s / 2
-    solar_intensity = - (time_series - solar_noon) ** 2 / (solar_noon ** 2) + 1
-    solar_intensity[solar_intensity < 0] = 0
+    solar_intensity = np.maximum(- (time_series - solar_noon) ** 2 / (solar_noon ** 2) + 1, 0.0)
     base_solar = 8e6 * solar_intensity
-    cloud_effect = np.ones_like(time_series, dtype=float)
+    cloud_effect = np.ones(len(time_series))
 
     # --- 核心修正：添加一个判断条件 ---
     # 只有当时间序列的点数足够多时，才添加云层效果
@@ -126,17 +78,19 @@ def generate_solar_power_data(duration_s, dt_s):
     return solar_power_fine, solar_power_upper
 
 
-def generate_load_data(duration_s, dt_s):
+@optional_jit
+def generate_load_data(duration_s, dt_s, seed=None):
+    if seed is not None:
+        np.random.seed(seed)
     time_series = np.arange(0, duration_s, dt_s)
-    base_load = 10e6 + 5e6 * np.sin(2 * np.pi * (time_series - 6 * 3600) / 86400) + 3e6 * np.sin(
-        4 * np.pi * (time_series - 9 * 3600) / 86400)
-    noise = 0.5e6 * np.random.randn(len(time_series))
-    load_power_fine = base_load + noise
+    load_power_fine = 10e6 + 5e6 * np.sin(2 * np.pi * (time_series - 6 * 3600) / 86400) + 3e6 * np.sin(
+        4 * np.pi * (time_series - 9 * 3600) / 86400) + np.random.normal(0.0, 0.5e6, len(time_series))
     downsample_ratio = int(900 / dt_s)
     load_power_upper = load_power_fine[::downsample_ratio]
     return load_power_fine, load_power_upper
 
 
+@optional_jit
 def generate_grid_price_data(duration_s, dt_s):
     time_series = np.arange(0, duration_s, dt_s)
     prices = np.ones(len(time_series)) * 300
@@ -148,7 +102,7 @@ def generate_grid_price_data(duration_s, dt_s):
 
 
 # =============================================================================
-# 3. 主仿真程序
+# 2. 主仿真程序
 # =============================================================================
 if __name__ == '__main__':
     # --- 仿真参数设置 (不变) ---
@@ -181,6 +135,10 @@ if __name__ == '__main__':
     hess.add_unit(DiabaticCAES(id='caes', dt_s=dt_lower))
     ems = HierarchicalMPCEms(hess, horizon_upper, horizon_lower)
 
+    # --- 预先生成上层滚动预测窗口 (循环中直接按时刻索引，无需逐步切片和补齐) ---
+    net_load_upper_windows_mw = forecast_windows(net_load_upper / 1e6, ems.PH_upper)
+    prices_upper_windows = forecast_windows(grid_prices_upper, ems.PH_upper)
+
     # --- 场景生成 (不变) ---
     print("正在生成不确定性场景...")
     num_scenarios = 10
@@ -190,15 +148,31 @@ if __name__ == '__main__':
         num_samples=1000, num_scenarios=num_scenarios,
         mean=np.array([0]), cov_matrix=cov_matrix
     )
+    # 预测误差场景只生成一次，仿真中每次上层决策都复用同一组场景 (不在循环内重新采样)
     scenarios_mw = np.random.randn(num_scenarios, horizon_upper) * scenarios_base
     print(f"{num_scenarios}个场景生成完毕。")
 
-    # --- 结果记录初始化 (不变) ---
-    results = {'p_hess_total': [], 'p_grid_exchange': [], 'soc': {uid: [] for uid in hess.all_units.keys()},
-               'dispatch': {uid: [] for uid in hess.all_units.keys()}}
+    # --- 结果记录初始化 (按时间步预分配数组) ---
+    n_steps = len(time_series_lower)
+    # 各单元的SOC/调度功率存放在 [单元数, 时间步数] 矩阵中 (行顺序即 hess.unit_index)，
+    # 每步只需整列写入一次；results 中按单元ID取到的是对应行的视图
+    soc_history = np.zeros((len(hess.units), n_steps))
+    dispatch_history = np.zeros((len(hess.units), n_steps))
+    results = {'p_hess_total': np.zeros(n_steps), 'p_grid_exchange': np.zeros(n_steps),
+               'soc': dict(zip(hess.all_units.keys(), soc_history)),
+               'dispatch': dict(zip(hess.all_units.keys(), dispatch_history))}
     p_grid_plan_upper = np.zeros(ems.PH_upper)
     slow_asset_dispatch_plan_upper = {unit.id: np.zeros(ems.PH_upper) for unit in ems.energy_assets}
 
+    # 上层计划的批量插值表：每个上层周期内各下层时间步在计划中的相对位置只需计算一次
+    slow_asset_ids = [unit.id for unit in ems.energy_assets]
+    upper_plan_fractions = (np.arange(0, dt_upper, dt_lower) % dt_upper) / dt_upper
+    upper_schedule_mw = np.zeros((len(slow_asset_ids) + 1, len(upper_plan_fractions)))
+
+    # 每个时间步的调度指令缓冲区 (单位: W)，按 hess.unit_index 的顺序存放各单元的功率
+    dispatch_buf_watts = np.zeros(len(hess.all_units))
+    slow_asset_idx = np.array([hess.unit_index[uid] for uid in slow_asset_ids], dtype=int)
+
     # --- 仿真循环开始 ---
     for k_lower, t_lower in tqdm(enumerate(time_series_lower), total=len(time_series_lower), desc="HESS 仿真进行中"):
         current_soc = hess.get_all_soc()
@@ -208,16 +182,8 @@ if __name__ == '__main__':
         # 1. 上层MPC决策 (每15分钟执行一次，制定经济计划)
         if t_lower % dt_upper == 0:
             k_upper = int(t_lower // dt_upper)
-            net_load_upper_forecast = net_load_upper[k_upper: k_upper + ems.PH_upper]
-            if len(net_load_upper_forecast) < ems.PH_upper:
-                net_load_upper_forecast = np.pad(net_load_upper_forecast,
-                                                 (0, ems.PH_upper - len(net_load_upper_forecast)), 'edge')
-            net_load_upper_forecast_mw = net_load_upper_forecast / 1e6
-
-            prices_upper_forecast = grid_prices_upper[k_upper: k_upper + ems.PH_upper]
-            if len(prices_upper_forecast) < ems.PH_upper:
-                prices_upper_forecast = np.pad(prices_upper_forecast, (0, ems.PH_upper - len(prices_upper_forecast)),
-                                               'edge')
+            net_load_upper_forecast_mw = net_load_upper_windows_mw[k_upper]
+            prices_upper_forecast = prices_upper_windows[k_upper]
 
             dispatch_upper = ems.solve_stochastic_upper_level(
                 current_soc, prices_upper_forecast, net_load_upper_forecast_mw, scenarios_mw, probabilities
@@ -229,24 +195,24 @@ if __name__ == '__main__':
                 p_grid_plan_upper = np.zeros(ems.PH_upper)
                 slow_asset_dispatch_plan_upper = {unit.id: np.zeros(ems.PH_upper) for unit in ems.energy_assets}
 
+            # 慢速储能计划与电网计划堆叠成一个矩阵 (最后一行为电网)，
+            # 一次性插值出本上层周期内所有下层时间步的指令 (单位: MW)
+            plan_matrix_mw = np.vstack([slow_asset_dispatch_plan_upper[uid] for uid in slow_asset_ids]
+                                       + [p_grid_plan_upper])
+            upper_schedule_mw = resample_upper_plan(plan_matrix_mw, upper_plan_fractions)
+
         # <--- CORRECTED LOGIC: 实时控制层 ---
 
-        # 2. 获取当前时刻的上层“经济计划”功率 (单位: W)
-        k_in_upper_plan_float = (t_lower % dt_upper) / dt_upper
+        # 2. 获取当前时刻的上层“经济计划”功率 (单位: W)，直接查表
+        k_in_upper = int((t_lower % dt_upper) // dt_lower)
+        schedule_watts = upper_schedule_mw[:, k_in_upper] * 1e6
 
         # 慢速储能的计划功率 (W)
-        planned_slow_dispatch_watts = {}
-        for uid, plan in slow_asset_dispatch_plan_upper.items():
-            if plan is not None and len(plan) > 0:
-                p_mw = np.interp(k_in_upper_plan_float, np.linspace(0, 1, len(plan), endpoint=False), plan)
-                planned_slow_dispatch_watts[uid] = p_mw * 1e6
-        total_planned_slow_dispatch_watts = sum(planned_slow_dispatch_watts.values())
+        planned_slow_dispatch_watts = schedule_watts[:-1]
+        total_planned_slow_dispatch_watts = planned_slow_dispatch_watts.sum()
 
         # 电网的计划功率 (W)
-        planned_grid_exchange_mw = np.interp(k_in_upper_plan_float,
-                                             np.linspace(0, 1, len(p_grid_plan_upper), endpoint=False),
-                                             p_grid_plan_upper)
-        planned_grid_exchange_watts = planned_grid_exchange_mw * 1e6
+        planned_grid_exchange_watts = schedule_watts[-1]
 
         # 3. 计算需要快速储能来平衡的“高频不平衡功率” (单位: W)
         # 这个差值是上层计划未能覆盖的、需要实时响应的部分
@@ -254,6 +220,7 @@ if __name__ == '__main__':
         imbalance_watts = actual_net_load_watts - (total_planned_slow_dispatch_watts + planned_grid_exchange_watts)
 
         # 4. 对这个“不平衡功率”进行小波包分解，交给下层MPC处理
+        #    (预测序列为常数，分解走快速路径，不会在每个时间步构建小波包树)
         imbalance_forecast_watts = np.full(ems.PH_lower, imbalance_watts)
         decomposed_signals = decompose_power_signal(imbalance_forecast_watts, wavelet='db4', level=3)
         mid_task_signal_mw = decomposed_signals["mid"] / 1e6
@@ -262,18 +229,18 @@ if __name__ == '__main__':
         dispatch_lower_mw = ems.solve_lower_level(current_soc, mid_task_signal_mw, high_task_signal_mw)
 
         # 5. 合成最终的、发送给物理模型的调度指令 (单位: W)
-        current_dispatch_watts = {uid: p_mw * 1e6 for uid, p_mw in dispatch_lower_mw.items()}
-        current_dispatch_watts.update(planned_slow_dispatch_watts)
+        dispatch_buf_watts.fill(0.0)
+        for uid, p_mw in dispatch_lower_mw.items():
+            dispatch_buf_watts[hess.unit_index[uid]] = p_mw * 1e6
+        dispatch_buf_watts[slow_asset_idx] = planned_slow_dispatch_watts
 
         # 6. 更新HESS状态并记录结果
-        hess.update_all_states(current_dispatch_watts)
+        hess.update_all_states(dispatch_buf_watts)
 
-        total_hess_power_watts = sum(current_dispatch_watts.values())
-        results['p_hess_total'].append(total_hess_power_watts)
-        results["p_grid_exchange"].append(planned_grid_exchange_watts)  # 记录计划的电网功率
-        for uid, unit in hess.all_units.items():
-            results['dispatch'][uid].append(current_dispatch_watts.get(uid, 0))
-            results['soc'][uid].append(unit.soc)
+        results['p_hess_total'][k_lower] = dispatch_buf_watts.sum()
+        results["p_grid_exchange"][k_lower] = planned_grid_exchange_watts  # 记录计划的电网功率
+        dispatch_history[:, k_lower] = dispatch_buf_watts
+        soc_history[:, k_lower] = [unit.soc for unit in hess.units]
 
     # --- 仿真结束，开始绘图 ---
     print("仿真完成，正在生成结果图像...")
@@ -283,9 +250,9 @@ if __name__ == '__main__':
 
     # 图1
     plt.figure(figsize=(12, 6))
-    plt.plot(time_h_lower, np.array(net_load_fine) / 1e6, label='净负荷 (MW)', alpha=0.7)
-    plt.plot(time_h_lower, np.array(results['p_hess_total']) / 1e6, label='HESS总输出功率 (MW)', linestyle='--')
-    plt.plot(time_h_lower, np.array(results['p_grid_exchange']) / 1e6, label='计划电网交换功率 (MW)', linestyle=':')
+    plt.plot(time_h_lower, net_load_fine / 1e6, label='净负荷 (MW)', alpha=0.7)
+    plt.plot(time_h_lower, results['p_hess_total'] / 1e6, label='HESS总输出功率 (MW)', linestyle='--')
+    plt.plot(time_h_lower, results['p_grid_exchange'] / 1e6, label='计划电网交换功率 (MW)', linestyle=':')
     plt.xlabel('时间 (小时)')
     plt.ylabel('功率 (MW)')
     plt.title('净负荷与混合储能系统响应（随机优化+实时控制）')
@@ -312,12 +279,12 @@ if __name__ == '__main__':
     # 图3
     plt.figure(figsize=(12, 8))
     for unit in ems.energy_assets:
-        plt.plot(time_h_lower, np.array(results['dispatch'][unit.id]) / 1e6, label=f'功率 - {unit.id.upper()}')
+        plt.plot(time_h_lower, results['dispatch'][unit.id] / 1e6, label=f'功率 - {unit.id.upper()}')
     for unit in ems.smoothing_assets:
-        plt.plot(time_h_lower, np.array(results['dispatch'][unit.id]) / 1e6, label=f'功率 - {unit.id.upper()}',
+        plt.plot(time_h_lower, results['dispatch'][unit.id] / 1e6, label=f'功率 - {unit.id.upper()}',
                  linestyle='--')
     for unit in ems.power_assets:
-        plt.plot(time_h_lower, np.array(results['dispatch'][unit.id]) / 1e6, label=f'功率 - {unit.id.upper()}',
+        plt.plot(time_h_lower, results['dispatch'][unit.id] / 1e6, label=f'功率 - {unit.id.upper()}',
                  linestyle=':')
     plt.xlabel('时间 (小时)')
     plt.ylabel('功率 (MW)')
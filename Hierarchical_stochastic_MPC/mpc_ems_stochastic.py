@@ -2,9 +2,13 @@
 # Note: This version separates the lower-level optimization into two distinct problems
 # to resolve the numerical instability caused by vastly different asset capacities.
 
+from types import SimpleNamespace
+
 import cvxpy as cp
 import numpy as np
 
+from mpc_common import configure_cvxpy_threads, create_gurobi_env, shift_warm_start, solve_in_order
+
 
 class HierarchicalMPCEms:
     def __init__(self, hess_system, upper_horizon, lower_horizon):
@@ -16,78 +20,165 @@ class HierarchicalMPCEms:
         self.smoothing_assets = [u for u in self.hess.all_units.values() if 'ees' in u.id]
         self.power_assets = [u for u in self.hess.all_units.values() if
                              any(keyword in u.id for keyword in ['fw', 'sc', 'smes'])]
-
-    def solve_with_fallback(self, problem):
-        try:
-            problem.solve(solver=cp.GUROBI, verbose=False)  # Set verbose=False for final run
-            if problem.status not in ["optimal", "optimal_inaccurate"]:
-                raise cp.error.SolverError("GUROBI failed or did not find an optimal solution.")
+        # Per-group parameter arrays (structure of arrays), extracted once so that problem building and
+        # result extraction work on NumPy vectors instead of unit attributes
+        self.energy = self._asset_arrays(self.energy_assets)
+        self.smooth = self._asset_arrays(self.smoothing_assets)
+        self.power = self._asset_arrays(self.power_assets)
+        # Upper bound on the number of scenarios kept in the upper-level problem; larger scenario
+        # sets are shrunk by backward reduction before solving
+        self.K_reduced = 10
+        configure_cvxpy_threads()
+
+        # Solver order per level. The upper level is an LP: GUROBI with dual simplex (Method=1, the
+        # algorithm that reuses the warm-start basis) and one env cached for all ticks, then HiGHS, then
+        # ECOS. The lower-level tracking problems are small sum_squares QPs solved every tick: OSQP,
+        # warm-started from the previous tick, then ECOS; GUROBI is not tried there.
+        gurobi_options = {"Method": 1}
+        gurobi_env = create_gurobi_env()
+        if gurobi_env is not None:
+            gurobi_options["env"] = gurobi_env
+        ecos = (cp.ECOS, {"max_iters": 500, "abstol": 1e-6})
+        self._upper_solvers = [(cp.GUROBI, gurobi_options), (cp.HIGHS, {}), ecos]
+        osqp = (cp.OSQP, {"polish": True, "eps_abs": 1e-5, "eps_rel": 1e-5, "max_iter": 4000})
+        self._lower_solvers = [osqp, ecos]
+
+        # Problems are built once and only their parameter values change between MPC ticks. The upper
+        # level depends on the number of scenarios, so it is (re)built when that number changes.
+        self._upper_num_scenarios = None
+        self._build_lower_problems()
+
+    @staticmethod
+    def _asset_arrays(assets):
+        """Collects the parameters of a group of assets into one array per parameter, in group order."""
+        cap = np.array([u.capacity_mwh for u in assets], dtype=float)
+        return SimpleNamespace(
+            ids=[u.id for u in assets],
+            eff=np.array([u.efficiency for u in assets], dtype=float),
+            cap=cap,
+            # Zero for a zero-capacity asset, whose SOC then stays constant without a separate branch
+            inv_cap=np.where(cap > 1e-6, 1.0 / np.maximum(cap, 1e-6), 0.0),
+            pmax=np.array([u.power_m_w for u in assets], dtype=float),
+            om=np.array([u.om_cost_per_mwh for u in assets], dtype=float),
+            soc_min=np.array([u.soc_min for u in assets], dtype=float),
+            soc_max=np.array([u.soc_max for u in assets], dtype=float),
+        )
+
+    def solve_with_fallback(self, problem, solvers):
+        """
+        Solves with the (solver, options) pairs in order (self._upper_solvers or self._lower_solvers) and
+        returns whether an optimal solution was found.
+        """
+        shift_warm_start(problem)
+        if solve_in_order(problem, solvers):
             return True
-        except (cp.error.SolverError, ImportError, AttributeError):
-            try:
-                problem.solve(solver=cp.ECOS, verbose=False, max_iters=500, abstol=1e-6)
-                if problem.status not in ["optimal", "optimal_inaccurate"]:
-                    raise cp.error.SolverError("ECOS failed or did not find an optimal solution.")
-                return True
-            except cp.error.SolverError as e:
-                print(f"Warning: All solvers failed. Final problem status: {problem.status}, Error: {e}")
-                return False
+        print(f"Warning: All solvers failed. Final problem status: {problem.status}")
+        return False
 
-    def solve_stochastic_upper_level(self, current_soc, grid_prices_upper, net_load_forecast_upper, scenarios,
-                                     probabilities):
+    def _matrix_storage_constraints(self, group, p_ch, p_dis, soc_init, dt_h, num_blocks=1):
         """
-        两阶段随机优化版本的上层MPC求解器。
-        - net_load_forecast_upper: 净负荷预测值 (负荷 - 可再生能源)。正值表示需要供电。
-        - scenarios: 预测误差场景, shape: [num_scenarios, PH_upper]。
-        - probabilities: 每个场景的概率。
+        Physical constraints of a group of assets (see _asset_arrays) in matrix form. Rows of the
+        (rows, horizon) power variables are the assets in order, repeated num_blocks times (one block per scenario for the
+        recourse assets); soc_init holds one value per asset. The SOC trajectory is not a variable but
+        its closed form SOC_t = SOC_0 + cumsum(dt * (P_ch - P_dis) / cap).
+        """
+        def rows(values):
+            # Per-asset values as an (n_rows, 1) column, broadcast along the horizon
+            return np.tile(np.asarray(values, dtype=float), num_blocks)[:, None]
+
+        n_rows = p_ch.shape[0]
+        eff = rows(group.eff)
+        p_max = rows(group.pmax)
+        soc_gain = rows(dt_h * group.inv_cap)
+        soc_0 = cp.hstack([soc_init] * num_blocks) if num_blocks > 1 else soc_init
+        soc = cp.reshape(soc_0, (n_rows, 1), order='F') + cp.cumsum(cp.multiply(p_ch - p_dis, soc_gain), axis=1)
+        return [
+            soc >= rows(group.soc_min),
+            soc <= rows(group.soc_max),
+            cp.multiply(p_dis, eff) <= p_max,
+            p_ch <= p_max * eff,
+        ]
+
+    @staticmethod
+    def _reduce_scenarios(scenarios, probabilities, k):
+        """
+        Backward scenario reduction: repeatedly drops the scenario with the smallest
+        probability x distance to its nearest remaining neighbour and moves its probability to that
+        neighbour, until k scenarios remain.
+        """
+        if len(probabilities) <= k:
+            return scenarios, probabilities
+        probabilities = probabilities.copy()
+        dist = np.linalg.norm(scenarios[:, None, :] - scenarios[None, :, :], axis=2)
+        np.fill_diagonal(dist, np.inf)
+        keep = np.ones(len(probabilities), dtype=bool)
+        for _ in range(len(probabilities) - k):
+            idx = np.flatnonzero(keep)
+            sub = dist[np.ix_(idx, idx)]
+            nearest = sub.argmin(axis=1)
+            removed = np.argmin(probabilities[idx] * sub[np.arange(len(idx)), nearest])
+            probabilities[idx[nearest[removed]]] += probabilities[idx[removed]]
+            keep[idx[removed]] = False
+        return scenarios[keep], probabilities[keep]
+
+    def _build_upper_problem(self, num_scenarios):
+        """
+        Builds the two-stage upper-level problem for a given number of scenarios. SOC, prices,
+        forecast, scenarios and probabilities are parameters, so later calls only update their values.
         """
-
         # --- 1. 获取参数 ---
-        num_scenarios = len(probabilities)
         dt_upper_h = (15 * 60) / 3600.0  # 15分钟转为小时
+        n_slow = len(self.energy.ids)
+        n_smooth = len(self.smooth.ids)
+
+        self._upper_num_scenarios = num_scenarios
+        self._soc_slow_param = cp.Parameter(n_slow) if n_slow else None
+        self._soc_smooth_param = cp.Parameter(n_smooth) if n_smooth else None
+        # 场景概率与电价的乘积作为一个参数 (各场景的期望电价权重)，保持问题满足 DPP 规则
+        self._weighted_price_param = cp.Parameter((num_scenarios, self.PH_upper))
+        self._net_load_param = cp.Parameter((1, self.PH_upper))
+        self._scenarios_param = cp.Parameter((num_scenarios, self.PH_upper))
+        self._prob_param = cp.Parameter(num_scenarios, nonneg=True)
 
         # --- 2. 定义决策变量 ---
+        # 矩阵形式：每一行对应一个储能单元 (第二阶段变量按场景分块，行号 = s * 单元数 + 单元序号)，
+        # 每一列对应一个时间步，约束整体以矩阵表达式给出，而不是逐单元、逐场景、逐时刻的标量约束
+
         # 【第一阶段变量】: "Here-and-Now"决策, 与场景s无关
-        # 慢速储能(energy_assets)的充放电功率和SOC
-        p_charge_upper_dc = {unit.id: cp.Variable(self.PH_upper, nonneg=True) for unit in self.energy_assets}
-        p_discharge_upper_dc = {unit.id: cp.Variable(self.PH_upper, nonneg=True) for unit in self.energy_assets}
-        soc_vars_upper = {unit.id: cp.Variable(self.PH_upper + 1) for unit in self.energy_assets}
+        # 慢速储能(energy_assets)的充放电功率 (SOC 由功率的累加和闭式给出, 不再单独设变量)
+        if n_slow:
+            p_ch_slow = cp.Variable((n_slow, self.PH_upper), nonneg=True)
+            p_dis_slow = cp.Variable((n_slow, self.PH_upper), nonneg=True)
 
         # 【第二阶段变量】: "Recourse"决策, 必须为每个场景s都定义一套
-        # 快速储能(smoothing_assets)的充放电功率和SOC
-        p_ch_smooth_dc = {(s, u.id): cp.Variable(self.PH_upper, nonneg=True) for s in range(num_scenarios) for u in
-                          self.smoothing_assets}
-        p_dis_smooth_dc = {(s, u.id): cp.Variable(self.PH_upper, nonneg=True) for s in range(num_scenarios) for u in
-                           self.smoothing_assets}
-        soc_smooth = {(s, u.id): cp.Variable(self.PH_upper + 1) for s in range(num_scenarios) for u in
-                      self.smoothing_assets}
+        # 快速储能(smoothing_assets)的充放电功率
+        if n_smooth:
+            p_ch_smooth = cp.Variable((num_scenarios * n_smooth, self.PH_upper), nonneg=True)
+            p_dis_smooth = cp.Variable((num_scenarios * n_smooth, self.PH_upper), nonneg=True)
 
         # 电网交互功率也是第二阶段的补救措施
         grid_exchange = cp.Variable((num_scenarios, self.PH_upper))
 
         # --- 3. 构建目标函数: Min(第一阶段成本 + 第二阶段期望成本) ---
+        # 运维成本 = 权重向量与各单元的功率时间累加值的内积：
+        # 放电权重 om * eff * dt (AC侧放电量)，充电权重 om / eff * dt (AC侧充电量)
+        def om_weights(group):
+            return group.om * group.eff * dt_upper_h, group.om / group.eff * dt_upper_h
+
         # 第一阶段成本: 慢速储能的运维成本 (与场景无关)
         cost_stage1 = 0
-        for unit in self.energy_assets:
-            power_ac_discharge = p_discharge_upper_dc[unit.id] * unit.efficiency
-            power_ac_charge = p_charge_upper_dc[unit.id] / unit.efficiency
-            total_energy_throughput_mwh = cp.sum(power_ac_discharge + power_ac_charge) * dt_upper_h
-            cost_stage1 += unit.om_cost_per_mwh * total_energy_throughput_mwh
-
-        # 第二阶段成本: 对每个场景s，计算其运行成本(电网+快速储能)，再按概率加权求和
-        cost_stage2_expected = 0
-        for s in range(num_scenarios):
-            # 场景s下的电网成本
-            grid_cost_s = cp.sum(cp.multiply(grid_exchange[s, :], grid_prices_upper)) * dt_upper_h
-
-            # 场景s下的快速储能运维成本
-            om_cost_smooth_s = 0
-            for unit in self.smoothing_assets:
-                power_ac_dis_s = p_dis_smooth_dc[s, unit.id] * unit.efficiency
-                power_ac_ch_s = p_ch_smooth_dc[s, unit.id] / unit.efficiency
-                om_cost_smooth_s += unit.om_cost_per_mwh * cp.sum(power_ac_dis_s + power_ac_ch_s) * dt_upper_h
-
-            cost_stage2_expected += probabilities[s] * (grid_cost_s + om_cost_smooth_s)
+        if n_slow:
+            w_dis, w_ch = om_weights(self.energy)
+            cost_stage1 = w_dis @ cp.sum(p_dis_slow, axis=1) + w_ch @ cp.sum(p_ch_slow, axis=1)
+
+        # 第二阶段成本: 各场景的电网成本按概率加权 (已包含在加权电价中)，再加上快速储能的期望运维成本
+        cost_stage2_expected = cp.sum(cp.multiply(grid_exchange, self._weighted_price_param)) * dt_upper_h
+        if n_smooth:
+            # 按场景分块的权重矩阵给出每个场景的快速储能运维成本 (长度为场景数的向量)，再按概率加权
+            w_dis_s, w_ch_s = om_weights(self.smooth)
+            om_cost_smooth = (np.kron(np.eye(num_scenarios), w_dis_s) @ cp.sum(p_dis_smooth, axis=1) +
+                              np.kron(np.eye(num_scenarios), w_ch_s) @ cp.sum(p_ch_smooth, axis=1))
+            cost_stage2_expected += self._prob_param @ om_cost_smooth
 
         objective = cp.Minimize(cost_stage1 + cost_stage2_expected)
 
@@ -95,150 +186,123 @@ class HierarchicalMPCEms:
         constraints = []
 
         # 【第一阶段约束】: 慢速储能的物理约束 (与场景无关)
-        for unit in self.energy_assets:
-            uid = unit.id
-            constraints.append(soc_vars_upper[uid][0] == current_soc[uid])
-            constraints.extend([soc_vars_upper[uid] >= unit.soc_min, soc_vars_upper[uid] <= unit.soc_max])
-            constraints.append(p_discharge_upper_dc[uid] * unit.efficiency <= unit.power_m_w)
-            constraints.append(p_charge_upper_dc[uid] <= unit.power_m_w * unit.efficiency)
-            for t in range(self.PH_upper):
-                energy_change_mwh = (p_charge_upper_dc[uid][t] - p_discharge_upper_dc[uid][t]) * dt_upper_h
-                # 避免除以零
-                if unit.capacity_mwh > 1e-6:
-                    constraints.append(
-                        soc_vars_upper[uid][t + 1] == soc_vars_upper[uid][t] + energy_change_mwh / unit.capacity_mwh)
-                else:  # 如果容量为0，则SOC不变
-                    constraints.append(soc_vars_upper[uid][t + 1] == soc_vars_upper[uid][t])
-
-        # 慢速储能总出力 (AC侧)，这是第一阶段决策，对所有场景都一样
-        total_slow_dispatch_ac = cp.sum([
-            p_discharge_upper_dc[u.id] * u.efficiency - p_charge_upper_dc[u.id] / u.efficiency
-            for u in self.energy_assets
-        ]) if self.energy_assets else 0
-
-        # 【第二阶段约束】: 对每个场景s，功率平衡和快速储能物理约束都必须成立
-        for s in range(num_scenarios):
-            # 场景s下的快速储能总出力(AC侧)
-            total_smooth_dispatch_ac_s = cp.sum([
-                p_dis_smooth_dc[s, u.id] * u.efficiency - p_ch_smooth_dc[s, u.id] / u.efficiency
-                for u in self.smoothing_assets
-            ]) if self.smoothing_assets else 0
-
-            # 场景s下的实际净负荷 = 预测值 + 场景误差
-            net_load_actual_s = net_load_forecast_upper + scenarios[s, :]
-
-            # 场景s下的功率平衡约束
-            constraints.append(
-                net_load_actual_s == total_slow_dispatch_ac + total_smooth_dispatch_ac_s + grid_exchange[s, :])
-
-            # 场景s下的快速储能物理约束
-            for unit in self.smoothing_assets:
-                uid = unit.id
-                constraints.append(soc_smooth[s, uid][0] == current_soc[uid])
-                constraints.extend([soc_smooth[s, uid] >= unit.soc_min, soc_smooth[s, uid] <= unit.soc_max])
-                constraints.append(p_dis_smooth_dc[s, uid] * unit.efficiency <= unit.power_m_w)
-                constraints.append(p_ch_smooth_dc[s, uid] <= unit.power_m_w * unit.efficiency)
-                for t in range(self.PH_upper):
-                    energy_change_mwh = (p_ch_smooth_dc[s, uid][t] - p_dis_smooth_dc[s, uid][t]) * dt_upper_h
-                    if unit.capacity_mwh > 1e-6:
-                        constraints.append(
-                            soc_smooth[s, uid][t + 1] == soc_smooth[s, uid][t] + energy_change_mwh / unit.capacity_mwh)
-                    else:
-                        constraints.append(soc_smooth[s, uid][t + 1] == soc_smooth[s, uid][t])
+        if n_slow:
+            constraints.extend(self._matrix_storage_constraints(
+                self.energy, p_ch_slow, p_dis_slow, self._soc_slow_param, dt_upper_h))
+
+        # 【第二阶段约束】: 快速储能物理约束对所有场景一次性给出
+        if n_smooth:
+            constraints.extend(self._matrix_storage_constraints(
+                self.smooth, p_ch_smooth, p_dis_smooth, self._soc_smooth_param, dt_upper_h,
+                num_blocks=num_scenarios))
+
+        # 【功率平衡】: 所有场景的功率平衡写成一个 (num_scenarios, PH_upper) 矩阵等式
+        # 各场景下的实际净负荷 = 预测值 + 场景误差
+        ones_s = np.ones((num_scenarios, 1))
+        net_load_actual = ones_s @ self._net_load_param + self._scenarios_param
+        total_dispatch_ac = grid_exchange
+        if n_slow:
+            # 慢速储能总出力 (AC侧)，这是第一阶段决策，对所有场景都一样：效率行向量与功率矩阵相乘
+            eff_slow = self.energy.eff[None, :]
+            total_slow_dispatch_ac = eff_slow @ p_dis_slow - (1 / eff_slow) @ p_ch_slow
+            total_dispatch_ac = total_dispatch_ac + ones_s @ total_slow_dispatch_ac
+        if n_smooth:
+            # 各场景下的快速储能总出力 (AC侧)：按场景分块的效率矩阵把每个场景的各单元功率行汇总为一行
+            eff_smooth = self.smooth.eff[None, :]
+            block_eff = np.kron(np.eye(num_scenarios), eff_smooth)
+            block_inv_eff = np.kron(np.eye(num_scenarios), 1 / eff_smooth)
+            total_dispatch_ac = total_dispatch_ac + block_eff @ p_dis_smooth - block_inv_eff @ p_ch_smooth
+        constraints.append(net_load_actual == total_dispatch_ac)
+
+        self._p_ch_slow = p_ch_slow if n_slow else None
+        self._p_dis_slow = p_dis_slow if n_slow else None
+        self._grid_exchange_upper = grid_exchange
+        self._upper_problem = cp.Problem(objective, constraints)
+
+    def solve_stochastic_upper_level(self, current_soc, grid_prices_upper, net_load_forecast_upper, scenarios,
+                                     probabilities):
+        """
+        两阶段随机优化版本的上层MPC求解器。
+        - net_load_forecast_upper: 净负荷预测值 (负荷 - 可再生能源)。正值表示需要供电。
+        - scenarios: 预测误差场景, shape: [num_scenarios, PH_upper]。
+        - probabilities: 每个场景的概率。
+        """
+        scenarios, probabilities = self._reduce_scenarios(
+            np.asarray(scenarios, dtype=float), np.asarray(probabilities, dtype=float), self.K_reduced)
+        if self._upper_num_scenarios != len(probabilities):
+            self._build_upper_problem(len(probabilities))
+
+        # 只更新参数值，问题结构保持不变
+        if self._soc_slow_param is not None:
+            self._soc_slow_param.value = np.array([current_soc[uid] for uid in self.energy.ids], dtype=float)
+        if self._soc_smooth_param is not None:
+            self._soc_smooth_param.value = np.array([current_soc[uid] for uid in self.smooth.ids], dtype=float)
+        self._weighted_price_param.value = probabilities[:, None] * np.asarray(grid_prices_upper, dtype=float)[None, :]
+        self._net_load_param.value = np.asarray(net_load_forecast_upper, dtype=float)[None, :]
+        self._scenarios_param.value = scenarios
+        self._prob_param.value = probabilities
 
         # --- 5. 求解问题 ---
-        problem = cp.Problem(objective, constraints)
-        if self.solve_with_fallback(problem):
+        if self.solve_with_fallback(self._upper_problem, self._upper_solvers):
             # 成功求解后，我们只需要返回第一阶段的决策结果
             # 因为这才是当前需要执行的日前计划
-            dispatch_ac = {unit.id: (p_discharge_upper_dc[unit.id].value * unit.efficiency) -
-                                    (p_charge_upper_dc[unit.id].value / unit.efficiency)
-                           for unit in self.energy_assets}
+            eff = self.energy.eff[:, None]
+            dispatch_ac = dict(zip(self.energy.ids, self._p_dis_slow.value * eff - self._p_ch_slow.value / eff))
 
             # 注意：电网计划现在是多场景的，可以返回期望值或第一个场景的值作为参考
-            grid_exchange_plan = grid_exchange.value[0, :]  # 或者 np.mean(grid_exchange.value, axis=0)
+            grid_exchange_plan = self._grid_exchange_upper.value[0, :]  # 或者 np.mean(..., axis=0)
 
             return {"status": "optimal", "dispatch": dispatch_ac, "grid_exchange": grid_exchange_plan}
         else:
             # 求解失败，返回零计划
-            failed_dispatch = {unit.id: np.zeros(self.PH_upper) for unit in self.energy_assets}
+            failed_dispatch = {uid: np.zeros(self.PH_upper) for uid in self.energy.ids}
             return {"status": "failed", "dispatch": failed_dispatch, "grid_exchange": np.zeros(self.PH_upper)}
 
+    def _build_lower_problems(self):
+        """
+        Builds the two lower-level tracking problems once, in matrix form (one row per asset); the SOC
+        and task signals are parameters.
+        """
+        self._mid_task_param = cp.Parameter(self.PH_lower)
+        self._high_task_param = cp.Parameter(self.PH_lower)
+        self._lower_problems = []
+
+        dt_h = self.hess.dt_s / 3600
+        # --- Problem 1: Smoothing Assets (e.g., ees) for Mid-Frequency Signal ---
+        # --- Problem 2: Power Assets (e.g., fw, sc, smes) for High-Frequency Signal ---
+        for group, task_param, weight in ((self.smooth, self._mid_task_param, 100),
+                                          (self.power, self._high_task_param, 1000)):
+            if not group.ids:
+                continue
+            soc_param = cp.Parameter(len(group.ids))
+            p_ch = cp.Variable((len(group.ids), self.PH_lower), nonneg=True)
+            p_dis = cp.Variable((len(group.ids), self.PH_lower), nonneg=True)
+
+            total_dispatch_ac = group.eff @ p_dis - (1 / group.eff) @ p_ch
+            objective = cp.Minimize(weight * cp.sum_squares(total_dispatch_ac - task_param))
+            constraints = self._matrix_storage_constraints(group, p_ch, p_dis, soc_param, dt_h)
+
+            self._lower_problems.append((group, soc_param, cp.Problem(objective, constraints), p_ch, p_dis))
+
+    def _solve_lower_group(self, lower_problem, current_soc):
+        """
+        Solves one lower-level tracking problem and returns the first-step AC dispatch of its assets.
+        """
+        group, soc_param, problem, p_ch, p_dis = lower_problem
+        soc_param.value = np.array([current_soc[uid] for uid in group.ids], dtype=float)
+        if not self.solve_with_fallback(problem, self._lower_solvers):
+            return {uid: 0 for uid in group.ids}
+        return dict(zip(group.ids, p_dis.value[:, 0] * group.eff - p_ch.value[:, 0] / group.eff))
+
     def solve_lower_level(self, current_soc, mid_task_signal, high_task_signal):
         """
         Main modification: This function now coordinates two separate, smaller optimizations.
         """
+        self._mid_task_param.value = np.asarray(mid_task_signal, dtype=float)
+        self._high_task_param.value = np.asarray(high_task_signal, dtype=float)
+
         final_dispatch = {}
+        for lower_problem in self._lower_problems:
+            final_dispatch.update(self._solve_lower_group(lower_problem, current_soc))
 
-        # --- Optimization 1: Smoothing Assets (e.g., ees) for Mid-Frequency Signal ---
-        if self.smoothing_assets:
-            p_ch_smooth_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.smoothing_assets}
-            p_dis_smooth_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.smoothing_assets}
-            soc_smooth = {u.id: cp.Variable(self.PH_lower + 1) for u in self.smoothing_assets}
-
-            total_smooth_dispatch_ac = cp.sum(
-                [p_dis_smooth_dc[u.id] * u.efficiency - p_ch_smooth_dc[u.id] / u.efficiency for u in
-                 self.smoothing_assets]
-            )
-
-            objective_mid = cp.Minimize(100 * cp.sum_squares(total_smooth_dispatch_ac - mid_task_signal))
-
-            constraints_mid = []
-            dt_h = self.hess.dt_s / 3600
-            for unit in self.smoothing_assets:
-                uid = unit.id
-                for t in range(self.PH_lower):
-                    energy_change_mwh = (p_ch_smooth_dc[uid][t] - p_dis_smooth_dc[uid][t]) * dt_h
-                    constraints_mid.append(
-                        soc_smooth[uid][t + 1] == soc_smooth[uid][t] + energy_change_mwh / unit.capacity_mwh)
-
-                constraints_mid.append(p_dis_smooth_dc[uid] * unit.efficiency <= unit.power_m_w)
-                constraints_mid.append(p_ch_smooth_dc[uid] <= unit.power_m_w * unit.efficiency)
-                constraints_mid.append(soc_smooth[uid][0] == current_soc[uid])
-                constraints_mid.extend([soc_smooth[uid] >= unit.soc_min, soc_smooth[uid] <= unit.soc_max])
-
-            problem_mid = cp.Problem(objective_mid, constraints_mid)
-            if self.solve_with_fallback(problem_mid):
-                for unit in self.smoothing_assets:
-                    dispatch_ac = (p_dis_smooth_dc[unit.id].value[0] * unit.efficiency) - (
-                                p_ch_smooth_dc[unit.id].value[0] / unit.efficiency)
-                    final_dispatch[unit.id] = dispatch_ac if dispatch_ac is not None else 0
-            else:
-                for unit in self.smoothing_assets: final_dispatch[unit.id] = 0
-
-        # --- Optimization 2: Power Assets (e.g., fw, sc, smes) for High-Frequency Signal ---
-        if self.power_assets:
-            p_ch_power_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.power_assets}
-            p_dis_power_dc = {u.id: cp.Variable(self.PH_lower, nonneg=True) for u in self.power_assets}
-            soc_power = {u.id: cp.Variable(self.PH_lower + 1) for u in self.power_assets}
-
-            total_power_dispatch_ac = cp.sum(
-                [p_dis_power_dc[u.id] * u.efficiency - p_ch_power_dc[u.id] / u.efficiency for u in self.power_assets]
-            )
-
-            objective_high = cp.Minimize(1000 * cp.sum_squares(total_power_dispatch_ac - high_task_signal))
-
-            constraints_high = []
-            dt_h = self.hess.dt_s / 3600
-            for unit in self.power_assets:
-                uid = unit.id
-                for t in range(self.PH_lower):
-                    energy_change_mwh = (p_ch_power_dc[uid][t] - p_dis_power_dc[uid][t]) * dt_h
-                    constraints_high.append(
-                        soc_power[uid][t + 1] == soc_power[uid][t] + energy_change_mwh / unit.capacity_mwh)
-
-                constraints_high.append(p_dis_power_dc[uid] * unit.efficiency <= unit.power_m_w)
-                constraints_high.append(p_ch_power_dc[uid] <= unit.power_m_w * unit.efficiency)
-                constraints_high.append(soc_power[uid][0] == current_soc[uid])
-                constraints_high.extend([soc_power[uid] >= unit.soc_min, soc_power[uid] <= unit.soc_max])
-
-            problem_high = cp.Problem(objective_high, constraints_high)
-            if self.solve_with_fallback(problem_high):
-                for unit in self.power_assets:
-                    dispatch_ac = (p_dis_power_dc[unit.id].value[0] * unit.efficiency) - (
-                                p_ch_power_dc[unit.id].value[0] / unit.efficiency)
-                    final_dispatch[unit.id] = dispatch_ac if dispatch_ac is not None else 0
-            else:
-                for unit in self.power_assets: final_dispatch[unit.id] = 0
-
-        return final_dispatch
\ No newline at end of file
+        return final_dispatch
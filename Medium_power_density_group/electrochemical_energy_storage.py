@@ -1,5 +1,6 @@
 # file: Medium_power_density_group/electrochemical_energy_storage.py (SOH简化版 V2.0)
 
+import math
 import numpy as np
 
 # 解决在子文件夹中导入父文件夹模块的问题
@@ -9,7 +10,10 @@ import os
 # 将项目根目录添加到Python的模块搜索路径中
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, IDLE, CHARGING, DISCHARGING, STATE_NAMES
+
+# 单位换算: 1 W 持续 1 s 的能量 (MWh)，把 W -> MW 与 s -> h 两次除法合并为一次乘法
+MWH_PER_WATT_SECOND = 1 / 3.6e9
 
 
 class ElectrochemicalEnergyStorage(BaseStorageModel):
@@ -40,7 +44,7 @@ class ElectrochemicalEnergyStorage(BaseStorageModel):
         self.soc = initial_soc
         self.power_m_w = rated_power_mw
         self.capacity_mwh = rated_capacity_mwh
-        self.efficiency = np.sqrt(charge_efficiency * discharge_efficiency)
+        self.efficiency = math.sqrt(charge_efficiency * discharge_efficiency)
         self.soc_min = soc_lower_limit
         self.soc_max = soc_upper_limit
         self.om_cost_per_mwh = om_cost_per_mwh
@@ -48,11 +52,18 @@ class ElectrochemicalEnergyStorage(BaseStorageModel):
         # 3. 保留EES特有的参数
         self.eta_ch = charge_efficiency
         self.eta_dis = discharge_efficiency
+        self._inv_eta_dis = 1.0 / discharge_efficiency
+        self.rated_power_w = self.power_m_w * 1e6
 
         # 4. 初始化核心状态变量：储存的能量 E_ees (单位: MWh)
         # 能量 = 容量 * SOC
         self.E_ees_mwh = self.capacity_mwh * self.soc
-        self.state = 'idle'
+        self.state = IDLE
+
+        # 5. 运行中不变的量只计算一次：SOC上下限对应的能量，以及容量的倒数 (零容量时SOC恒为0)
+        self.E_max_mwh = self.capacity_mwh * self.soc_max
+        self.E_min_mwh = self.capacity_mwh * self.soc_min
+        self._inv_capacity_mwh = 1.0 / self.capacity_mwh if self.capacity_mwh > 1e-6 else 0.0
 
 
     def update_state(self, dispatch_power_w):
@@ -60,12 +71,10 @@ class ElectrochemicalEnergyStorage(BaseStorageModel):
         根据调度指令（单位：W）更新储能状态。
         这是被HESS系统统一调用的接口方法。
         """
-        if dispatch_power_w > 0:
-            # 正功率表示放电
-            self.discharge(dispatch_power_w, self.dt_s)
-        elif dispatch_power_w < 0:
-            # 负功率表示充电
-            self.charge(abs(dispatch_power_w), self.dt_s)
+        # 正功率表示放电，负功率表示充电；充放电共用同一条更新路径
+        charging = dispatch_power_w < 0
+        if charging or dispatch_power_w > 0:
+            self._apply_power(abs(dispatch_power_w), self.dt_s, charging)
         else:
             # 零功率表示闲置 (无损耗)
             self.idle_loss(self.dt_s)
@@ -73,70 +82,153 @@ class ElectrochemicalEnergyStorage(BaseStorageModel):
 
     def get_soc(self):
         """根据储存的能量计算并更新SOC"""
-        if self.capacity_mwh > 1e-6:
-            self.soc = self.E_ees_mwh / self.capacity_mwh
-        else:
-            self.soc = 0
+        self.soc = self.E_ees_mwh * self._inv_capacity_mwh
         return self.soc
 
     def get_available_charge_power(self):
         """获取当前可用的充电功率 (单位: W)"""
-        if self.get_soc() >= self.soc_max:
+        # 直接由储能量判断SOC是否到限，不经过 get_soc() 的方法调用
+        if self.E_ees_mwh * self._inv_capacity_mwh >= self.soc_max:
             return 0
-        return self.power_m_w * 1e6
+        return self.rated_power_w
 
     def get_available_discharge_power(self):
         """获取当前可用的放电功率 (单位: W)"""
-        if self.get_soc() <= self.soc_min:
+        if self.E_ees_mwh * self._inv_capacity_mwh <= self.soc_min:
             return 0
-        return self.power_m_w * 1e6
+        return self.rated_power_w
 
     def charge(self, power_elec_w, time_s):
         """按指定电功率充电，对应动态方程"""
-        # 确认充电功率不超过限制
-        power_elec_w = min(power_elec_w, self.get_available_charge_power())
-        if power_elec_w <= 0:
-            self.idle_loss(time_s)
-            return
-
-        self.state = 'charging'
-
-        # E(t) = E(t-dt) + P_ch * eta_ch * dt
-        # 单位转换: 功率(W) -> (MW), 时间(s) -> (h)
-        power_elec_mw = power_elec_w / 1e6
-        time_h = time_s / 3600.0
-        delta_energy_mwh = power_elec_mw * self.eta_ch * time_h
-
-        # 更新储能，并确保不超过SOC上限对应的能量
-        self.E_ees_mwh += delta_energy_mwh
-        self.E_ees_mwh = min(self.E_ees_mwh, self.capacity_mwh * self.soc_max)
+        self._apply_power(power_elec_w, time_s, charging=True)
 
     def discharge(self, power_elec_w, time_s):
         """按指定电功率放电，对应动态方程"""
-        # 确认放电功率不超过限制
-        power_elec_w = min(power_elec_w, self.get_available_discharge_power())
+        self._apply_power(power_elec_w, time_s, charging=False)
+
+    def _apply_power(self, power_elec_w, time_s, charging):
+        """
+        充放电的统一实现，方向只决定功率上限、效率的用法和起作用的能量限值：
+        充电 E(t) = E(t-dt) + P_ch * eta_ch * dt，放电 E(t) = E(t-dt) - (P_dis / eta_dis) * dt
+        (放电时乘以预先算好的 1 / eta_dis)
+        """
+        # 确认充放电功率不超过限制
+        available_w = self.get_available_charge_power() if charging else self.get_available_discharge_power()
+        power_elec_w = min(power_elec_w, available_w)
         if power_elec_w <= 0:
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = CHARGING if charging else DISCHARGING
 
-        # E(t) = E(t-dt) - (P_dis / eta_dis) * dt
-        # 单位转换: 功率(W) -> (MW), 时间(s) -> (h)
-        power_elec_mw = power_elec_w / 1e6
-        time_h = time_s / 3600.0
-        delta_energy_mwh = (power_elec_mw / self.eta_dis) * time_h
+        # 电侧能量 (MWh) = P(W) * t(s) / 3.6e9
+        energy_elec_mwh = power_elec_w * time_s * MWH_PER_WATT_SECOND
 
-        # 更新储能，并确保不低于SOC下限对应的能量
-        self.E_ees_mwh -= delta_energy_mwh
-        self.E_ees_mwh = max(self.E_ees_mwh, self.capacity_mwh * self.soc_min)
+        # 更新储能，并确保不超出SOC上限 (充电) 或下限 (放电) 对应的能量
+        if charging:
+            self.E_ees_mwh = min(self.E_ees_mwh + energy_elec_mwh * self.eta_ch, self.E_max_mwh)
+        else:
+            self.E_ees_mwh = max(self.E_ees_mwh - energy_elec_mwh * self._inv_eta_dis, self.E_min_mwh)
 
     def idle_loss(self, time_s):
         """简化模型，暂不考虑自放电"""
-        self.state = 'idle'
+        self.state = IDLE
         pass
 
 
+class ElectrochemicalStorageFleet:
+    """
+    多台电化学储能的批量模型 (数组结构, SoA)
+    - 每个参数/状态量是一条长度为 N 的浮点数组，而不是 N 个对象各自的属性。
+    - 默认 float64；大规模扫描可选 float32，内存带宽和缓存占用减半，SOC 误差约 1e-6 量级。
+    - update_state 用一次数组运算更新整个机群，逐台的行为与 ElectrochemicalEnergyStorage 完全一致。
+    - state 为整数编码，与单台模型的 state 相同 (含义见 STATE_NAMES)。
+    """
+
+    STATE_NAMES = STATE_NAMES
+
+    def __init__(self, units, dtype=np.float64):
+        """
+        参数:
+        units (list[ElectrochemicalEnergyStorage]): 用于初始化机群的单台模型 (复制其参数和当前储能量)。
+        dtype: 参数与状态数组的浮点类型 (np.float64 或 np.float32)。
+        """
+        self.dtype = dtype = np.dtype(dtype)
+        self.ids = [u.id for u in units]
+        self.capacity_mwh = np.array([u.capacity_mwh for u in units], dtype=dtype)
+        self.rated_power_w = np.array([u.rated_power_w for u in units], dtype=dtype)
+        self.eta_ch = np.array([u.eta_ch for u in units], dtype=dtype)
+        self._inv_eta_dis = np.array([u._inv_eta_dis for u in units], dtype=dtype)
+        self.soc_min = np.array([u.soc_min for u in units], dtype=dtype)
+        self.soc_max = np.array([u.soc_max for u in units], dtype=dtype)
+        # 1 W 持续一个仿真步长的能量 (MWh)
+        self._mwh_per_watt_step = (np.array([u.dt_s for u in units], dtype=float) * MWH_PER_WATT_SECOND).astype(dtype)
+        self.E_max_mwh = np.array([u.E_max_mwh for u in units], dtype=dtype)
+        self.E_min_mwh = np.array([u.E_min_mwh for u in units], dtype=dtype)
+        self._inv_capacity_mwh = np.array([u._inv_capacity_mwh for u in units], dtype=dtype)
+
+        self.E_ees_mwh = np.array([u.E_ees_mwh for u in units], dtype=dtype)
+        self.state = np.zeros(len(units), dtype=np.int8)
+
+    def get_soc(self):
+        """各台储能的当前SOC (数组)"""
+        return self.E_ees_mwh * self._inv_capacity_mwh
+
+    def update_state(self, dispatch_power_w):
+        """
+        按各台的调度指令（单位：W，正为放电，负为充电）同时更新整个机群的状态。
+        """
+        self._step(slice(None), np.asarray(dispatch_power_w, dtype=self.dtype))
+
+    def _step(self, rows, dispatch_power_w):
+        """对 rows (切片) 选中的储能推进一个时间步，原地写回其储能量与状态。"""
+        energy = self.E_ees_mwh[rows]  # 基本切片为视图，下面的原地写入直接更新机群状态
+        soc = energy * self._inv_capacity_mwh[rows]
+        # 实际功率受额定功率限制；SOC已到上限(下限)的储能不再充电(放电)，按闲置处理
+        power_w = np.minimum(np.abs(dispatch_power_w), self.rated_power_w[rows])
+        charging = (dispatch_power_w < 0) & (soc < self.soc_max[rows]) & (power_w > 0)
+        discharging = (dispatch_power_w > 0) & (soc > self.soc_min[rows]) & (power_w > 0)
+
+        # E(t) = E(t-dt) + P_ch * eta_ch * dt   或   E(t) = E(t-dt) - (P_dis / eta_dis) * dt
+        # 中间结果复用已分配的数组 (out=)，每步不再为每个运算各分配一块临时数组
+        energy_elec_mwh = np.multiply(power_w, self._mwh_per_watt_step[rows], out=power_w)
+        energy_charged = np.multiply(energy_elec_mwh, self.eta_ch[rows])
+        energy_charged += energy
+        np.minimum(energy_charged, self.E_max_mwh[rows], out=energy_charged)
+        energy_discharged = np.multiply(energy_elec_mwh, self._inv_eta_dis[rows], out=soc)
+        np.subtract(energy, energy_discharged, out=energy_discharged)
+        np.maximum(energy_discharged, self.E_min_mwh[rows], out=energy_discharged)
+        np.copyto(energy, energy_charged, where=charging)
+        np.copyto(energy, energy_discharged, where=discharging)
+
+        state = self.state[rows]
+        state.fill(IDLE)
+        state[charging] = CHARGING
+        state[discharging] = DISCHARGING
+
+    def simulate(self, dispatch_power_w, block_size=4096):
+        """
+        按调度指令序列连续仿真整个机群，用于参数扫描/蒙特卡洛等批量场景 (每台储能即一组独立样本)。
+        机群按 block_size 台分块，每块跑完全部时间步再处理下一块，使每步的中间数组留在缓存中。
+
+        参数:
+        dispatch_power_w (np.array): 各台储能各时间步的功率指令 (W), shape: [N, 时间步数]。
+        block_size (int): 每块的储能台数。
+
+        返回:
+        soc_history (np.array): 每一步更新后各台储能的SOC, shape: [N, 时间步数]。
+        """
+        dispatch_power_w = np.asarray(dispatch_power_w, dtype=self.dtype)
+        soc_history = np.empty(dispatch_power_w.shape, dtype=self.dtype)
+        for start in range(0, dispatch_power_w.shape[0], block_size):
+            rows = slice(start, start + block_size)
+            block_dispatch = dispatch_power_w[rows]
+            for t in range(dispatch_power_w.shape[1]):
+                self._step(rows, block_dispatch[:, t])
+                np.multiply(self.E_ees_mwh[rows], self._inv_capacity_mwh[rows], out=soc_history[rows, t])
+        return soc_history
+
+
 # --- 单元测试代码 (已简化) ---
 if __name__ == "__main__":
     ees = ElectrochemicalEnergyStorage(id='ees_test', dt_s=3600, initial_soc=0.5)
@@ -4,6 +4,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from hess_system import HybridEnergyStorageSystem
 from mpc_ems import MPCEnergyManagementSystem
+from mpc_common import forecast_windows
 
 # 导入所有8种储能模型
 from high_power_density_group.flywheel_simulation import FlywheelModel
@@ -79,30 +80,24 @@ mpc_ems = MPCEnergyManagementSystem(hess, prediction_horizon)
 
 # --- 3. 仿真主循环 ---
 all_units_list = list(hess.all_units.values())
-results = { "p_grid_exchange": [], "p_hess_total": [] }
+# 结果记录按时间步预分配数组，循环中按下标写入
+results = { "p_grid_exchange": np.zeros(time_steps), "p_hess_total": np.zeros(time_steps) }
 for unit in all_units_list:
     unit_type = unit.id.split('_')[0]
-    results[f"p_{unit_type}"] = []
-    results[f"soc_{unit_type}"] = []
+    results[f"p_{unit_type}"] = np.zeros(time_steps)
+    results[f"soc_{unit_type}"] = np.zeros(time_steps)
+
+# 各时刻的预测窗口在循环外一次性生成
+wind_windows = forecast_windows(raw_wind, prediction_horizon)
+solar_windows = forecast_windows(solar_power, prediction_horizon)
+load_windows = forecast_windows(load_power, prediction_horizon)
+price_windows = forecast_windows(grid_prices, prediction_horizon)
 
 print("--- 开始MPC经济调度仿真 ---")
 for i in range(time_steps):
     current_soc = {unit.id: unit.get_soc() for unit in all_units_list}
 
-    end_idx = i + prediction_horizon
-    # ... (准备预测数据，此处省略)
-    pred_wind = raw_wind[i:end_idx]
-    pred_solar = solar_power[i:end_idx]
-    pred_load = load_power[i:end_idx]
-    pred_prices = grid_prices[i:end_idx]
-    if len(pred_wind) < prediction_horizon:
-        pad_width = prediction_horizon - len(pred_wind)
-        pred_wind = np.pad(pred_wind, (0, pad_width), 'edge')
-        pred_solar = np.pad(pred_solar, (0, pad_width), 'edge')
-        pred_load = np.pad(pred_load, (0, pad_width), 'edge')
-        pred_prices = np.pad(pred_prices, (0, pad_width), 'edge')
-
-    dispatch_plan = mpc_ems.solve(current_soc, pred_wind, pred_solar, pred_load, pred_prices)
+    dispatch_plan = mpc_ems.solve(current_soc, wind_windows[i], solar_windows[i], load_windows[i], price_windows[i])
 
     if dispatch_plan:
         for unit in all_units_list:
@@ -119,12 +114,12 @@ for i in range(time_steps):
         power_key = f"p_{unit_type}"
         soc_key = f"soc_{unit_type}"
         dispatched_power = dispatch_plan.get(f"{unit.id}_power", 0) if dispatch_plan else 0
-        results[power_key].append(dispatched_power)
-        results[soc_key].append(unit.get_soc())
+        results[power_key][i] = dispatched_power
+        results[soc_key][i] = unit.get_soc()
         p_hess_total += dispatched_power
 
-    results["p_hess_total"].append(p_hess_total)
-    results["p_grid_exchange"].append(dispatch_plan.get("grid_power")[0] if dispatch_plan else 0)
+    results["p_hess_total"][i] = p_hess_total
+    results["p_grid_exchange"][i] = dispatch_plan.get("grid_power")[0] if dispatch_plan else 0
 
     if i % 4 == 0:
         print(f"仿真进度: {(i / time_steps) * 100:.1f}%")
@@ -148,8 +143,8 @@ axs[0].legend(loc='upper left')
 ax_price.legend(loc='upper right')
 
 # 图2: 电网交互与HESS总功率
-axs[1].bar(time_h, np.array(results["p_grid_exchange"]) / 1e6, width=0.05, label="电网交互功率 (购电为正)")
-axs[1].plot(time_h, np.array(results["p_hess_total"]) / 1e6, 'k-', label="HESS总功率 (放电为正)")
+axs[1].bar(time_h, results["p_grid_exchange"] / 1e6, width=0.05, label="电网交互功率 (购电为正)")
+axs[1].plot(time_h, results["p_hess_total"] / 1e6, 'k-', label="HESS总功率 (放电为正)")
 axs[1].set_title("电网交互与HESS总出力", fontsize=16)
 axs[1].set_ylabel("功率 (MW)")
 axs[1].legend()
@@ -158,7 +153,7 @@ axs[1].grid(True)
 # 图3: 各储能单元出力
 for unit in all_units_list:
     unit_type = unit.id.split('_')[0]
-    axs[2].plot(time_h, np.array(results[f"p_{unit_type}"]) / 1e6, label=f"{unit_type} 功率")
+    axs[2].plot(time_h, results[f"p_{unit_type}"] / 1e6, label=f"{unit_type} 功率")
 axs[2].set_title("各储能单元出力", fontsize=16)
 axs[2].set_ylabel("功率 (MW)")
 axs[2].legend()
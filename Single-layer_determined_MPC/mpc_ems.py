@@ -1,144 +1,296 @@
 # file: PythonProject/mpc_ems.py (V8.0 - 八储能混合整数最终版)
 
+from multiprocessing import Pool
+
 import cvxpy as cp
 import numpy as np
 
+from mpc_common import create_gurobi_env, shift_warm_start, solve_in_order
+
+# 批量求解时每个工作进程持有的 EMS 副本 (进程启动时传入一次，之后各场景复用其已编译的问题)
+_worker_ems = None
+
+
+def _init_worker(ems):
+    global _worker_ems
+    _worker_ems = ems
+
+
+def _solve_in_worker(scenario):
+    return _worker_ems.solve(*scenario)
+
 
 class MPCEnergyManagementSystem:
-    def __init__(self, hess_system, prediction_horizon):
+    # 带启停 (0-1) 变量的单元：单元ID -> (充电侧额定功率属性, 放电侧额定功率属性)
+    COMMITMENT_RATINGS = {"hes_01": ("P_ely_rated", "P_fc_rated"), "caes_01": ("P_comp_rated", "P_gen_rated")}
+
+    def __init__(self, hess_system, prediction_horizon, integer_horizon=3):
         self.hess = hess_system
         self.PH = prediction_horizon
+        # 启停整数变量只在前 integer_horizon 步保持0-1约束，其后松弛为 [0, 1] 连续变量：
+        # 闭环只执行第一步的指令，远期启停状态只需近似，分支定界的搜索空间因此大幅缩小
+        self.integer_horizon = integer_horizon
+        self.dt_h = (60 * 15) / 3600.0
+        self._gurobi_env = create_gurobi_env()
+        # 优化问题只在初始化时构建一次：每步变化的数据 (初始SOC、预测、电价) 声明为 cp.Parameter，
+        # 问题满足 DPP，CVXPY 缓存编译结果，solve() 只需更新参数值再求解
+        self._build_problem()
 
-    def solve(self, current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh):
+    def _build_problem(self):
         all_units = list(self.hess.all_units.values())
-        dt_h = (60 * 15) / 3600.0
+        self._unit_ids = [u.id for u in all_units]
+        dt_h = self.dt_h
+
+        # --- 0. 每步更新的参数 ---
+        self.soc_init = cp.Parameter(len(all_units))  # 各单元的初始SOC，顺序同 all_units
+        self.predicted_wind = cp.Parameter(self.PH)
+        self.predicted_solar = cp.Parameter(self.PH)
+        self.predicted_load = cp.Parameter(self.PH)
+        self.price_coeffs = cp.Parameter(self.PH)  # 电价折算的购电成本系数 (元/W)，在 solve() 中由电价预先算好
 
         # --- 1. 定义变量 ---
-        charge_power = {u.id: cp.Variable(self.PH, nonneg=True) for u in all_units}
-        discharge_power = {u.id: cp.Variable(self.PH, nonneg=True) for u in all_units}
-        soc = {u.id: cp.Variable(self.PH + 1) for u in all_units}
+        # 所有单元的充放电功率与SOC堆叠为 [单元数, 时间步] 矩阵 (行顺序同 all_units)，按单元ID取到的是对应行
+        n_units = len(all_units)
+        self.P_ch = cp.Variable((n_units, self.PH), nonneg=True)
+        self.P_dis = cp.Variable((n_units, self.PH), nonneg=True)
+        self.SOC = cp.Variable((n_units, self.PH + 1))
+        charge_power = {u.id: self.P_ch[i] for i, u in enumerate(all_units)}
+        discharge_power = {u.id: self.P_dis[i] for i, u in enumerate(all_units)}
         grid_power = cp.Variable(self.PH)
         slack_shortage = cp.Variable(self.PH, nonneg=True)
         slack_surplus = cp.Variable(self.PH, nonneg=True)
 
-        # --- 为HES和CAES引入二进制变量 ---
-        u_hes_ely, u_hes_fc, u_hes_ely_start, u_hes_fc_start = None, None, None, None
-        u_caes_comp, u_caes_gen, u_caes_comp_start, u_caes_gen_start = None, None, None, None
-
-        if self.hess.all_units.get("hes_01"):
-            u_hes_ely = cp.Variable(self.PH, boolean=True)
-            u_hes_fc = cp.Variable(self.PH, boolean=True)
-            u_hes_ely_start = cp.Variable(self.PH, boolean=True)
-            u_hes_fc_start = cp.Variable(self.PH, boolean=True)
-
-        if self.hess.all_units.get("caes_01"):
-            u_caes_comp = cp.Variable(self.PH, boolean=True)
-            u_caes_gen = cp.Variable(self.PH, boolean=True)
-            u_caes_comp_start = cp.Variable(self.PH, boolean=True)
-            u_caes_gen_start = cp.Variable(self.PH, boolean=True)
+        # --- 为HES和CAES引入二进制变量 (充电侧启停, 放电侧启停) ---
+        commitment_units = [uid for uid in self.COMMITMENT_RATINGS if self.hess.all_units.get(uid)]
+        commitment_bounds = []
+        self._split_commitments = []  # 由 (0-1部分, 松弛部分) 拼接而成的启停变量，见 _shift_mip_start
+        commitments = {uid: (self._commitment_variable(commitment_bounds), self._commitment_variable(commitment_bounds))
+                       for uid in commitment_units}
 
         constraints = []
         # --- 2. 添加储能单元自身约束 ---
-        for unit in all_units:
-            constraints += [soc[unit.id][0] == current_soc_dict[unit.id]]
-            constraints += [charge_power[unit.id] <= getattr(unit, 'P_comp_rated', unit.rated_power_w)]
-            constraints += [discharge_power[unit.id] <= getattr(unit, 'P_gen_rated', unit.rated_power_w)]
-            constraints += [soc[unit.id] >= unit.soc_min, soc[unit.id] <= unit.soc_max]
-
-            for t in range(self.PH):
-                # ========================= 动态方程约束 (已包含全部8种储能) =========================
-                uid = unit.id
-                if 'ees' in uid:
-                    delta_e = (discharge_power[uid][t] / unit.eta_dis - charge_power[uid][
-                        t] * unit.eta_ch) * dt_h / 1000
-                    constraints += [soc[uid][t + 1] == soc[uid][t] - (delta_e / unit.nominal_capacity_kwh)]
-                elif 'fw' in uid:
-                    e_total_J = 0.5 * unit.J * (unit.omega_max ** 2 - unit.omega_min ** 2)
-                    capacity_kwh = e_total_J / 3.6e6
-                    net_power_w = discharge_power[uid][t] - charge_power[uid][t]
-                    delta_e_kwh = net_power_w * dt_h / 1000
-                    constraints += [soc[uid][t + 1] == soc[uid][t] - (
-                                delta_e_kwh / (capacity_kwh if capacity_kwh > 1e-6 else 1e-6))]
-                elif 'phs' in uid:
-                    flow_in = (charge_power[uid][t] * unit.eta_pump) / (1000 * 9.81 * unit.h_eff)
-                    flow_out = discharge_power[uid][t] / (1000 * 9.81 * unit.h_eff * unit.eta_gen)
-                    delta_v = (flow_in - flow_out) * (dt_h * 3600)
-                    constraints += [soc[uid][t + 1] == soc[uid][t] + delta_v / unit.V_ur_max]
-                elif 'tes' in uid:
-                    heat_in = charge_power[uid][t] * unit.eta_e2h
-                    heat_out = discharge_power[uid][t] / unit.eta_h2e
-                    heat_loss = unit.H_tes_max_J * unit.theta_loss * (dt_h * 3600)
-                    delta_h = (heat_in - heat_out) * (dt_h * 3600) - heat_loss
-                    constraints += [soc[uid][t + 1] == soc[uid][t] + delta_h / unit.H_tes_max_J]
-                elif 'hes' in uid:
-                    m_dot_ely = (charge_power[uid][t] / 1000) / unit.eta_ely_kwh_kg
-                    m_dot_fc = (discharge_power[uid][t] / 1000) / (33.3 * unit.eta_fc_elec)
-                    delta_m_kg = (m_dot_ely - m_dot_fc) * dt_h
-                    constraints += [soc[uid][t + 1] == soc[uid][t] + delta_m_kg / unit.M_tank_max]
-                elif 'sc' in uid:
-                    e_total_J = 0.5 * unit.C_sc * (unit.V_max ** 2 - unit.V_min ** 2)
-                    capacity_kwh = e_total_J / 3.6e6
-                    net_power_w = discharge_power[uid][t] - charge_power[uid][t]
-                    delta_e_kwh = net_power_w * dt_h / 1000
-                    constraints += [soc[uid][t + 1] == soc[uid][t] - (
-                                delta_e_kwh / (capacity_kwh if capacity_kwh > 1e-6 else 1e-6))]
-                elif 'smes' in uid:
-                    e_total_J = 0.5 * unit.L_smes * unit.I_max ** 2
-                    capacity_kwh = e_total_J / 3.6e6
-                    net_power_w = discharge_power[uid][t] - charge_power[uid][t]
-                    delta_e_kwh = net_power_w * dt_h / 1000
-                    constraints += [soc[uid][t + 1] == soc[uid][t] - (
-                                delta_e_kwh / (capacity_kwh if capacity_kwh > 1e-6 else 1e-6))]
-                elif 'caes' in uid:
-                    mass_in_kg_per_h = (charge_power[uid][t] / 1000) * unit.eta_charge_rate
-                    mass_out_kg_per_h = (discharge_power[uid][t] / 1000) * unit.eta_air_usage
-                    delta_m_kg = (mass_in_kg_per_h - mass_out_kg_per_h) * dt_h
-                    constraints += [soc[uid][t + 1] == soc[uid][t] + delta_m_kg / unit.M_air_max]
+        # 按单元取值的系数写成 [单元数, 1] 列向量，沿时间维广播
+        soc_min = np.array([u.soc_min for u in all_units])[:, None]
+        soc_max = np.array([u.soc_max for u in all_units])[:, None]
+        constraints += [self.SOC[:, 0] == self.soc_init, self.SOC >= soc_min, self.SOC <= soc_max]
+        # 额定充/放电功率表 (顺序同 all_units，CAES 为压缩机/发电机额定功率)，所有单元合写成两条矩阵约束
+        self.P_ch_rated = np.array([getattr(u, 'P_comp_rated', u.rated_power_w) for u in all_units], dtype=float)
+        self.P_dis_rated = np.array([getattr(u, 'P_gen_rated', u.rated_power_w) for u in all_units], dtype=float)
+        constraints += [self.P_ch <= self.P_ch_rated[:, None], self.P_dis <= self.P_dis_rated[:, None]]
 
-        # --- 3. 添加混合整数约束 ---
-        if u_hes_ely is not None:
-            constraints += [charge_power["hes_01"] <= self.hess.all_units["hes_01"].P_ely_rated * u_hes_ely]
-            constraints += [discharge_power["hes_01"] <= self.hess.all_units["hes_01"].P_fc_rated * u_hes_fc]
-            constraints += [u_hes_ely + u_hes_fc <= 1]
-            # (启停逻辑省略以简化，你可以在此基础上添加)
-        if u_caes_comp is not None:
-            constraints += [charge_power["caes_01"] <= self.hess.all_units["caes_01"].P_comp_rated * u_caes_comp]
-            constraints += [discharge_power["caes_01"] <= self.hess.all_units["caes_01"].P_gen_rated * u_caes_gen]
-            constraints += [u_caes_comp + u_caes_gen <= 1]
-            # (启停逻辑省略以简化)
+        # ========================= 动态方程约束 (已包含全部8种储能) =========================
+        # 各储能的动态方程都是仿射的 soc[t+1] = soc[t] + a_ch * P_ch[t] + a_dis * P_dis[t] + c，
+        # 所有单元、整个预测时域合写成一条矩阵约束
+        dynamics = [self._soc_dynamics(u, dt_h) for u in all_units]
+        rows = [i for i, d in enumerate(dynamics) if d is not None]
+        if rows:
+            a_ch, a_dis, c = np.array([dynamics[i] for i in rows]).T[:, :, None]
+            if len(rows) == n_units:
+                rows = slice(None)
+            constraints += [self.SOC[rows, 1:] == self.SOC[rows, :-1] + cp.multiply(a_ch, self.P_ch[rows])
+                            + cp.multiply(a_dis, self.P_dis[rows]) + c]
 
         # --- 4. 系统级约束 ---
-        total_hess_power = sum(discharge_power.values()) - sum(charge_power.values())
+        total_hess_power = cp.sum(self.P_dis - self.P_ch, axis=0)  # 沿单元维度一次归约，得到各时间步的储能总净功率
         constraints += [(
-                                    predicted_wind + predicted_solar + total_hess_power + grid_power) - predicted_load == slack_surplus - slack_shortage]
+                                    self.predicted_wind + self.predicted_solar + total_hess_power + grid_power) - self.predicted_load == slack_surplus - slack_shortage]
         grid_max_power_w = 400e6  # 增大了电网交互限额
         constraints += [grid_power <= grid_max_power_w, grid_power >= -grid_max_power_w]
 
         # --- 5. 定义目标函数 ---
-        grid_cost = cp.sum(cp.multiply(grid_prices_per_mwh / 1e6, grid_power) * dt_h)
-        om_cost = 0
-        for unit in all_units:
-            if 'hes' not in unit.id and 'caes' not in unit.id:  # 对非启停储能计算吞吐量成本
-                total_throughput_w = charge_power[unit.id] + discharge_power[unit.id]
-                om_cost += cp.sum(getattr(unit, 'cost_per_kwh', 0.01) * (total_throughput_w * dt_h / 1000))
+        grid_cost = self.price_coeffs @ grid_power
+        # 吞吐量成本权重 (元/W，顺序同 all_units)：只对非启停储能计算，HES/CAES 的权重为0
+        cost_vec = np.array([0.0 if 'hes' in u.id or 'caes' in u.id else getattr(u, 'cost_per_kwh', 0.01)
+                             for u in all_units]) * (dt_h / 1000)
+        om_cost = cost_vec @ cp.sum(self.P_ch + self.P_dis, axis=1)
         # (启停成本省略以简化)
 
         penalty_price_per_mwh = 10000
-        slack_cost = penalty_price_per_mwh * cp.sum(slack_shortage + slack_surplus) * dt_h / 1e6
+        slack_coeff = penalty_price_per_mwh * dt_h / 1e6
+        slack_cost = slack_coeff * cp.sum(slack_shortage + slack_surplus)
         objective = cp.Minimize(grid_cost + om_cost + slack_cost)
 
+        # --- 3. 添加混合整数约束 ---
+        self.problem = cp.Problem(objective, constraints + commitment_bounds
+                                  + self._commitment_constraints(charge_power, discharge_power, commitments))
+
+        # 分解求解 (solve_decomposed) 用到的两个 LP，与上面的问题共用变量：
+        # 启停变量松弛为 [0, 1] 连续变量的问题，以及启停状态作为参数给定的问题
+        self._relaxed_commitments = {uid: (cp.Variable(self.PH, nonneg=True), cp.Variable(self.PH, nonneg=True))
+                                     for uid in commitment_units}
+        self._relaxed_problem = cp.Problem(objective, constraints + self._commitment_constraints(
+            charge_power, discharge_power, self._relaxed_commitments))
+        self._fixed_commitments = {uid: (cp.Parameter(self.PH, nonneg=True), cp.Parameter(self.PH, nonneg=True))
+                                   for uid in commitment_units}
+        self._fixed_problem = cp.Problem(objective, constraints + self._commitment_constraints(
+            charge_power, discharge_power, self._fixed_commitments))
+        # 没有HES/CAES (或 integer_horizon 为0) 时问题不含整数变量，是纯线性规划
+        self._solvers = [cp.GUROBI] if self.problem.is_mixed_integer() else [cp.HIGHS, cp.GUROBI]
+        self.charge_power = charge_power
+        self.discharge_power = discharge_power
+        self.grid_power = grid_power
+
+    # cvxpy 的变量与问题对象不参与序列化：进程间只传递构造参数，反序列化时重新构建问题
+    _PICKLED_ATTRS = ('hess', 'PH', 'integer_horizon', 'dt_h')
+
+    def __getstate__(self):
+        return {name: self.__dict__[name] for name in self._PICKLED_ATTRS}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._gurobi_env = create_gurobi_env()
+        self._build_problem()
+
+    def _commitment_variable(self, bounds):
+        """
+        创建长度为 PH 的启停变量：前 integer_horizon 步为0-1整数变量，其余步为 [0, 1] 连续变量
+        (其上界约束追加到 bounds 中)。
+        """
+        n_integer = max(0, min(self.integer_horizon, self.PH))
+        if n_integer == self.PH:
+            return cp.Variable(self.PH, boolean=True)
+        relaxed = cp.Variable(self.PH - n_integer, nonneg=True)
+        bounds += [relaxed <= 1]
+        if n_integer == 0:
+            return relaxed
+        integer = cp.Variable(n_integer, boolean=True)
+        self._split_commitments.append((integer, relaxed))
+        return cp.hstack([integer, relaxed])
+
+    def _shift_mip_start(self):
+        """
+        将上一步的解前移一步作为本步的 MIP start (见 shift_warm_start)。拼接而成的启停变量按完整序列前移：
+        若两部分各自前移，最后一个整数步会沿用自身的旧值，而不是下一步 (松弛部分首个元素) 的启停状态；
+        前移进0-1部分的值取整。
+        """
+        previous = [(integer, relaxed, np.concatenate((integer.value, relaxed.value)))
+                    for integer, relaxed in self._split_commitments
+                    if integer.value is not None and relaxed.value is not None]
+        shift_warm_start(self.problem)
+        for integer, relaxed, value in previous:
+            shifted = np.append(value[1:], value[-1])
+            integer.value = np.round(shifted[:integer.size])
+            relaxed.project_and_assign(shifted[integer.size:])
+
+    def _commitment_constraints(self, charge_power, discharge_power, commitments):
+        """启停约束：充/放电功率受启停状态限制，且同一时刻不能同时充放电 (commitments: 单元ID -> (充电启停, 放电启停))。"""
+        constraints = []
+        for uid, (u_ch, u_dis) in commitments.items():
+            unit = self.hess.all_units[uid]
+            ch_rating, dis_rating = self.COMMITMENT_RATINGS[uid]
+            constraints += [charge_power[uid] <= getattr(unit, ch_rating) * u_ch]
+            constraints += [discharge_power[uid] <= getattr(unit, dis_rating) * u_dis]
+            constraints += [u_ch + u_dis <= 1]
+            # (启停逻辑省略以简化，你可以在此基础上添加)
+        return constraints
+
+    @staticmethod
+    def _soc_dynamics(unit, dt_h):
+        """
+        返回储能单元一个时间步的SOC动态系数 (a_ch, a_dis, c)：
+        soc[t+1] = soc[t] + a_ch * P_ch[t] + a_dis * P_dis[t] + c (功率单位 W)。未知类型返回 None (不加动态约束)。
+        """
+        uid = unit.id
+        dt_s = dt_h * 3600
+        if 'ees' in uid:
+            # delta_E (kWh) = (P_dis / eta_dis - P_ch * eta_ch) * dt_h / 1000
+            scale = dt_h / 1000 / unit.nominal_capacity_kwh
+            return unit.eta_ch * scale, -scale / unit.eta_dis, 0.0
+        elif 'fw' in uid:
+            return MPCEnergyManagementSystem._lossless_dynamics(
+                0.5 * unit.J * (unit.omega_max ** 2 - unit.omega_min ** 2), dt_h)
+        elif 'phs' in uid:
+            # 抽水/发电流量 (m^3/s) 与功率成正比
+            flow_per_w = 1 / (1000 * 9.81 * unit.h_eff)
+            return (flow_per_w * unit.eta_pump * dt_s / unit.V_ur_max,
+                    -flow_per_w / unit.eta_gen * dt_s / unit.V_ur_max, 0.0)
+        elif 'tes' in uid:
+            # 散热损失与功率无关，为常数项
+            return (unit.eta_e2h * dt_s / unit.H_tes_max_J, -dt_s / (unit.eta_h2e * unit.H_tes_max_J),
+                    -unit.theta_loss * dt_s)
+        elif 'hes' in uid:
+            # 制氢/耗氢速率 (kg/h) 与功率 (kW) 成正比
+            return (dt_h / 1000 / unit.eta_ely_kwh_kg / unit.M_tank_max,
+                    -dt_h / 1000 / (33.3 * unit.eta_fc_elec) / unit.M_tank_max, 0.0)
+        elif 'sc' in uid:
+            return MPCEnergyManagementSystem._lossless_dynamics(
+                0.5 * unit.C_sc * (unit.V_max ** 2 - unit.V_min ** 2), dt_h)
+        elif 'smes' in uid:
+            return MPCEnergyManagementSystem._lossless_dynamics(0.5 * unit.L_smes * unit.I_max ** 2, dt_h)
+        elif 'caes' in uid:
+            return (unit.eta_charge_rate * dt_h / 1000 / unit.M_air_max,
+                    -unit.eta_air_usage * dt_h / 1000 / unit.M_air_max, 0.0)
+        return None
+
+    @staticmethod
+    def _lossless_dynamics(e_total_J, dt_h):
+        """飞轮/超级电容/超导磁储能：delta_E (kWh) = (P_dis - P_ch) * dt_h / 1000，容量由可用能量 (J) 换算。"""
+        capacity_kwh = e_total_J / 3.6e6
+        scale = dt_h / 1000 / (capacity_kwh if capacity_kwh > 1e-6 else 1e-6)
+        return scale, -scale, 0.0
+
+    def _set_parameters(self, current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh):
+        self.soc_init.value = np.array([current_soc_dict[uid] for uid in self._unit_ids], dtype=float)
+        self.predicted_wind.value = predicted_wind
+        self.predicted_solar.value = predicted_solar
+        self.predicted_load.value = predicted_load
+        self.price_coeffs.value = np.asarray(grid_prices_per_mwh, dtype=np.float64) * (self.dt_h / 1e6)
+
+    def _solve_problem(self, problem, solvers):
+        """依次尝试 solvers 中的求解器 (GUROBI 复用缓存的环境)，返回是否得到最优解。"""
+        gurobi_options = {"env": self._gurobi_env} if self._gurobi_env is not None else {}
+        return solve_in_order(problem, [(solver, gurobi_options if solver == cp.GUROBI else {}) for solver in solvers])
+
+    def _optimal_dispatch(self):
+        optimal_dispatch = {"grid_power": self.grid_power.value}
+        # 各单元首个时间步的净功率 (放电为正) 直接从功率矩阵中一次取出
+        net_power = self.P_dis.value[:, 0] - self.P_ch.value[:, 0]
+        for uid, p_net in zip(self._unit_ids, net_power):
+            optimal_dispatch[uid + "_power"] = p_net
+        return optimal_dispatch
+
+    def solve(self, current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh):
+        self._set_parameters(current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh)
+
         # --- 6. 求解问题 ---
-        problem = cp.Problem(objective, constraints)
-        problem.solve(solver=cp.GUROBI, verbose=False)
-
-        if problem.status in ["optimal", "optimal_inaccurate"]:
-            optimal_dispatch = {"grid_power": grid_power.value}
-            for unit in all_units:
-                net_power = 0
-                if discharge_power[unit.id].value is not None and charge_power[unit.id].value is not None:
-                    net_power = discharge_power[unit.id].value[0] - charge_power[unit.id].value[0]
-                optimal_dispatch[unit.id + "_power"] = net_power
-            return optimal_dispatch
+        # 滚动时域中相邻两步的问题几乎相同：用上一步前移后的解 (含启停整数变量) 作为初始解 (MIP start)
+        problem = self.problem
+        self._shift_mip_start()
+        # 混合整数问题交给 GUROBI；纯 LP 优先用 HiGHS 求解，省去 GUROBI 接口的建模开销，失败时再退回 GUROBI
+        if self._solve_problem(problem, self._solvers):
+            return self._optimal_dispatch()
         else:
             print(f"FATAL: MPC problem is '{problem.status}'. Check model constraints and parameters.")
-            return None
\ No newline at end of file
+            return None
+
+    def solve_decomposed(self, current_soc_dict, predicted_wind, predicted_solar, predicted_load,
+                         grid_prices_per_mwh):
+        """
+        用两次 LP 代替一次 MILP 的松弛-固定分解 (relax-and-fix)，参数与返回值同 solve()：
+        先求解启停变量松弛为 [0, 1] 的 LP；再逐时间步为 HES/CAES 选定工作模式——松弛解中取值较大且非零的一侧开启，
+        否则停机；最后固定启停状态求解一次 LP。松弛或固定后的 LP 求解失败时退回完整的混合整数问题。
+        """
+        if not self._relaxed_commitments:
+            return self.solve(current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh)
+
+        self._set_parameters(current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh)
+        lp_solvers = [cp.HIGHS, cp.GUROBI]
+        shift_warm_start(self._relaxed_problem)
+        if self._solve_problem(self._relaxed_problem, lp_solvers):
+            for uid, (u_ch, u_dis) in self._relaxed_commitments.items():
+                fixed_ch, fixed_dis = self._fixed_commitments[uid]
+                fixed_ch.value = ((u_ch.value >= u_dis.value) & (u_ch.value > 1e-6)).astype(float)
+                fixed_dis.value = ((u_dis.value > u_ch.value) & (u_dis.value > 1e-6)).astype(float)
+            if self._solve_problem(self._fixed_problem, lp_solvers):
+                return self._optimal_dispatch()
+
+        return self.solve(current_soc_dict, predicted_wind, predicted_solar, predicted_load, grid_prices_per_mwh)
+
+    def solve_batch(self, scenarios, processes=None):
+        """
+        并行求解多个相互独立的场景 (蒙特卡洛 / 情景分析)。
+        scenarios 中每一项为 solve() 的参数元组 (current_soc_dict, predicted_wind, predicted_solar,
+        predicted_load, grid_prices_per_mwh)；返回与之一一对应的 solve() 结果列表。
+        """
+        with Pool(processes, initializer=_init_worker, initargs=(self,)) as pool:
+            return pool.map(_solve_in_worker, scenarios)
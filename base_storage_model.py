@@ -2,6 +2,39 @@
 # 备注：这是一个所有储能模型的“父类”或“基类”。
 #       它负责处理所有储能单元共有的属性和方法。
 
+import numpy as np
+
+# 储能运行状态 (整数编码，避免每个时间步写入字符串)；STATE_NAMES[state] 为对应的名称
+IDLE, CHARGING, DISCHARGING = 0, 1, 2
+STATE_NAMES = ('idle', 'charging', 'discharging')
+
+
+class HistoryBuffer:
+    """
+    按时间步记录单个量的历史数据。
+    数据存放在预分配的 float64 数组中 (容量不足时按倍数扩容)，避免长时间仿真中
+    Python 列表逐个 append 浮点对象带来的内存与分配开销。
+    """
+
+    def __init__(self, expected_steps=1024):
+        self._data = np.empty(max(int(expected_steps), 1))
+        self._size = 0
+
+    def append(self, value):
+        if self._size == self._data.shape[0]:
+            self._data = np.concatenate((self._data, np.empty_like(self._data)))
+        self._data[self._size] = value
+        self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def values(self):
+        """已记录的数据 (预分配数组中已写入部分的视图)。"""
+        return self._data[:self._size]
+
+
 class BaseStorageModel:
     def __init__(self, id, dt_s):
         """
@@ -39,4 +72,9 @@ class BaseStorageModel:
         """
         获取当前SOC.
         """
-        return self.soc
\ No newline at end of file
+        return self.soc
+
+    @property
+    def state_name(self):
+        """当前运行状态的名称 ('idle' / 'charging' / 'discharging')."""
+        return STATE_NAMES[self.state]
\ No newline at end of file
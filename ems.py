@@ -10,6 +10,21 @@ class HierarchicalEMS:
 
     def __init__(self, hess_system):
         self.hess = hess_system
+        # 流式分解的滑动窗口状态：上一次调用的窗口 [起点, 终点]、窗口长度与窗口内数值之和
+        self._window_start, self._window_end, self._window_size, self._window_sum = 0, -1, None, 0.0
+
+    @staticmethod
+    def precompute_decomposition(total_fluctuation_series, short_window_size=5):
+        """
+        离线仿真时波动序列事先已知：一次性向量化算出整条序列的分解结果 (与逐步调用 decompose_signal 的滑动平均一致)，
+        返回 (高频分量数组, 中频分量数组)，仿真循环中按下标取值即可。
+        """
+        series = np.asarray(total_fluctuation_series, dtype=float)
+        prefix_sum = np.concatenate(([0.0], np.cumsum(series)))
+        index = np.arange(len(series))
+        start_index = np.maximum(0, index - short_window_size)
+        p_medium_freq = (prefix_sum[index + 1] - prefix_sum[start_index]) / (index + 1 - start_index)
+        return series - p_medium_freq, p_medium_freq
 
     def decompose_signal(self, total_fluctuation_series, current_index, short_window_size=5):
         """
@@ -17,10 +32,17 @@ class HierarchicalEMS:
         """
         # 建立一个短期的历史窗口
         start_index = max(0, current_index - short_window_size)
-        window = total_fluctuation_series[start_index: current_index + 1]
 
-        # 计算窗口内的移动平均值，作为中频分量
-        p_medium_freq = np.mean(window)
+        # 计算窗口内的移动平均值，作为中频分量。仿真中逐步调用 (current_index 每次加1、窗口长度不变) 时
+        # 窗口和增量更新：加上新进入窗口的值，减去移出窗口的值；其他情况对窗口重新求和
+        if current_index == self._window_end + 1 and short_window_size == self._window_size:
+            self._window_sum += total_fluctuation_series[current_index]
+            if start_index > self._window_start:
+                self._window_sum -= total_fluctuation_series[self._window_start]
+        else:
+            self._window_sum = float(np.sum(total_fluctuation_series[start_index: current_index + 1]))
+        self._window_start, self._window_end, self._window_size = start_index, current_index, short_window_size
+        p_medium_freq = self._window_sum / (current_index + 1 - start_index)
 
         # 当前总波动与中频分量的差值，作为高频分量
         p_high_freq = total_fluctuation_series[current_index] - p_medium_freq
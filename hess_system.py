@@ -15,6 +15,10 @@ class HybridEnergyStorageSystem:
         """
         self.dt_s = dt_s
         self.all_units = {}
+        # 单元ID -> 在 all_units 中的位置 (即添加顺序)，用于按数组下标读写各单元的功率指令
+        self.unit_index = {}
+        # 按 unit_index 顺序排列的单元列表，与功率指令/状态数组逐行对应
+        self.units = []
 
     def add_unit(self, unit):
         """
@@ -23,7 +27,9 @@ class HybridEnergyStorageSystem:
         """
         if unit.id in self.all_units:
             raise ValueError(f"ID为 '{unit.id}' 的储能单元已存在。")
+        self.unit_index[unit.id] = len(self.all_units)
         self.all_units[unit.id] = unit
+        self.units.append(unit)
         print(f"成功添加储能单元: {unit.id} (类型: {type(unit).__name__})")
 
     def get_all_soc(self):
@@ -41,9 +47,15 @@ class HybridEnergyStorageSystem:
         【新方法】根据当前时间步的调度信号，更新所有储能单元的状态。
 
         参数:
-        dispatch_signals (dict): 一个字典，key是单元ID，value是该单元的功率指令(W)。
+        dispatch_signals (dict 或 数组): 一个字典，key是单元ID，value是该单元的功率指令(W)；
+                                   或按 unit_index 顺序排列的功率指令数组(W)。
                                    正数表示放电，负数表示充电。
         """
+        if not isinstance(dispatch_signals, dict):
+            for unit_obj, power_w in zip(self.units, dispatch_signals):
+                unit_obj.update_state(power_w)
+            return
+
         # --- 修改区域: 适配新的update_state接口 ---
         for unit_id, unit_obj in self.all_units.items():
             # 从调度信号字典中获取对应ID的功率指令，如果找不到则默认为0
@@ -1,7 +1,6 @@
 # file: high_power_density_group/Superconducting_magnetic_energy_storage_simulation.py (统一接口修改版 V1.0)
 
 import math
-import numpy as np
 
 # 解决在子文件夹中导入父文件夹模块的问题
 import sys
@@ -11,7 +10,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # --- 修改区域 1: 导入正确的基类 ---
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, IDLE, CHARGING, DISCHARGING
 
 
 # --- 修改区域 2: 让 SMES 继承 BaseStorageModel ---
@@ -76,8 +75,7 @@ class SuperconductingMagneticEnergyStorage(BaseStorageModel):
         # 根据初始SOC和新的电流范围，精确计算初始电流
         self.I_smes = math.sqrt(self.soc * (self.I_max ** 2 - self.I_min ** 2) + self.I_min ** 2)
 
-        self.current_history = []
-        self.state = 'idle'
+        self.state = IDLE
 
     # ==============================================================================
     # --- 新增：核心标准接口 update_state ---
@@ -118,12 +116,12 @@ class SuperconductingMagneticEnergyStorage(BaseStorageModel):
             voltage = (power_elec_net * self.eta_pcs) / current_I
         else:
             voltage = - (power_elec_net / (current_I * self.eta_pcs))
-        return np.clip(voltage, -self.V_pcs_max, self.V_pcs_max)
+        return min(max(voltage, -self.V_pcs_max), self.V_pcs_max)
 
     def _update_current(self, V_pcs, time_s):
         """根据PCS电压更新线圈电流"""
         self.I_smes += (V_pcs / self.L_smes) * time_s
-        self.I_smes = np.clip(self.I_smes, self.I_min, self.I_max)
+        self.I_smes = min(max(self.I_smes, self.I_min), self.I_max)
 
     def get_available_charge_power(self):
         """获取当前可用的充电功率 (W), 这是PCS的净功率"""
@@ -142,7 +140,7 @@ class SuperconductingMagneticEnergyStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
         V_pcs = self._get_pcs_voltage(power_elec_net, is_charging=True)
         self._update_current(V_pcs, time_s)
 
@@ -153,14 +151,14 @@ class SuperconductingMagneticEnergyStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
         V_pcs = self._get_pcs_voltage(power_elec_net, is_charging=False)
         self._update_current(V_pcs, time_s)
 
     def idle_loss(self, time_s):
         """闲置时，线圈电流无损耗"""
-        self.state = 'idle'
-        self._update_current(0, time_s)
+        self.state = IDLE
+        # PCS电压为零时电流不变 (且已在约束范围内)，无需再做电流积分与限幅
 
 
 # --- 单元测试代码 (保持不变) ---
@@ -1,7 +1,6 @@
 # file: high_power_density_group/flywheel_simulation.py (统一接口修改版 V1.0)
 
 import math
-import numpy as np
 
 # 解决在子文件夹中导入父文件夹模块的问题
 import sys
@@ -10,7 +9,7 @@ import os
 # 将项目根目录添加到Python的模块搜索路径中
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, IDLE, CHARGING, DISCHARGING
 
 
 class FlywheelModel(BaseStorageModel):
@@ -46,7 +45,7 @@ class FlywheelModel(BaseStorageModel):
         self.soc = initial_soc
         self.power_m_w = rated_power_mw
         self.capacity_mwh = rated_capacity_mwh
-        self.efficiency = np.sqrt(charge_efficiency * discharge_efficiency)
+        self.efficiency = math.sqrt(charge_efficiency * discharge_efficiency)
         self.soc_min = 0.1
         self.soc_max = 0.9
         self.om_cost_per_mwh = om_cost_per_mwh
@@ -76,6 +75,9 @@ class FlywheelModel(BaseStorageModel):
             self.rated_torque_mg = self.rated_power_w / self.omega_min
         else:
             self.rated_torque_mg = 0
+        # 额定转矩对应的功率上限与转速成正比: P = T * w / eta_ch (充电) 或 T * w * eta_dis (放电)，预先合并系数
+        self._torque_power_per_omega_ch = self.rated_torque_mg / self.eta_ch
+        self._torque_power_per_omega_dis = self.rated_torque_mg * self.eta_dis
 
         # 设定一个合理的待机损耗，例如占额定功率的0.1%
         # 损耗转矩 T_loss = kf * w, 损耗功率 P_loss = kf * w^2
@@ -91,8 +93,7 @@ class FlywheelModel(BaseStorageModel):
         # 根据初始SOC和新的速度范围，精确计算初始角速度
         self.omega = math.sqrt(self.soc * (self.omega_max ** 2 - self.omega_min ** 2) + self.omega_min ** 2)
 
-        self.angular_vel_history = []
-        self.state = 'idle'
+        self.state = IDLE
 
     # ==============================================================================
     # --- 新增：核心标准接口 update_state ---
@@ -122,7 +123,7 @@ class FlywheelModel(BaseStorageModel):
             tau_mg = (power_elec * self.eta_ch) / current_omega
         else:
             tau_mg = - (power_elec / (current_omega * self.eta_dis))
-        return np.clip(tau_mg, -self.rated_torque_mg, self.rated_torque_mg)
+        return min(max(tau_mg, -self.rated_torque_mg), self.rated_torque_mg)
 
     def _get_loss_torque(self):
         return self.kf * self.omega
@@ -132,7 +133,7 @@ class FlywheelModel(BaseStorageModel):
 
     def _update_angular_velocity(self, tau_net, time_s):
         self.omega += (tau_net / self.J) * time_s
-        self.omega = np.clip(self.omega, self.omega_min, self.omega_max)
+        self.omega = min(max(self.omega, self.omega_min), self.omega_max)
 
     # ==============================================================================
     # --- HESS标准接口实现 (charge/discharge等现在作为内部方法) ---
@@ -146,15 +147,11 @@ class FlywheelModel(BaseStorageModel):
 
     def get_available_charge_power(self):
         if self.omega >= self.omega_max: return 0
-        power_limit_by_rated_p = self.rated_power_w
-        power_limit_by_rated_t = (self.rated_torque_mg * self.omega) / self.eta_ch
-        return min(power_limit_by_rated_p, power_limit_by_rated_t)
+        return min(self.rated_power_w, self._torque_power_per_omega_ch * self.omega)
 
     def get_available_discharge_power(self):
         if self.omega <= self.omega_min: return 0
-        power_limit_by_rated_p = self.rated_power_w
-        power_limit_by_rated_t = (self.rated_torque_mg * self.omega) * self.eta_dis
-        return min(power_limit_by_rated_p, power_limit_by_rated_t)
+        return min(self.rated_power_w, self._torque_power_per_omega_dis * self.omega)
 
     def charge(self, power_elec, time_s):
         power_elec = min(power_elec, self.get_available_charge_power())
@@ -162,7 +159,7 @@ class FlywheelModel(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
         tau_mg = self._get_electromagnetic_torque(power_elec, is_charging=True)
         tau_net = self._get_net_torque(tau_mg)
         self._update_angular_velocity(tau_net, time_s)
@@ -173,13 +170,13 @@ class FlywheelModel(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
         tau_mg = self._get_electromagnetic_torque(power_elec, is_charging=False)
         tau_net = self._get_net_torque(tau_mg)
         self._update_angular_velocity(tau_net, time_s)
 
     def idle_loss(self, time_s):
-        self.state = 'idle'
+        self.state = IDLE
         tau_mg = 0
         tau_net = self._get_net_torque(tau_mg)
         self._update_angular_velocity(tau_net, time_s)
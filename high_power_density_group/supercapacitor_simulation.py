@@ -1,7 +1,6 @@
 # file: high_power_density_group/supercapacitor_simulation.py (统一接口修改版 V1.0)
 
 import math
-import numpy as np
 
 # 解决在子文件夹中导入父文件夹模块的问题
 import sys
@@ -11,7 +10,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # --- 修改区域 1: 导入正确的基类 ---
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, IDLE, CHARGING, DISCHARGING
 
 
 # --- 修改区域 2: 让 Supercapacitor 继承 BaseStorageModel ---
@@ -49,7 +48,7 @@ class Supercapacitor(BaseStorageModel):
         # 对于超级电容，其充放电库仑效率接近1，总效率主要受ESR损耗影响
         # P_loss = I^2 * R. P_out = V*I - I^2*R. eta = P_out / (V*I) = 1 - I*R/V
         # 这是一个动态值，我们这里用一个较高的典型值
-        self.efficiency = np.sqrt(charge_efficiency * discharge_efficiency)
+        self.efficiency = math.sqrt(charge_efficiency * discharge_efficiency)
         self.soc_min = 0.05
         self.soc_max = 0.95
         self.om_cost_per_mwh = om_cost_per_mwh
@@ -95,8 +94,7 @@ class Supercapacitor(BaseStorageModel):
         # 根据初始SOC和新的电压范围，精确计算初始电压
         self.V_sc = math.sqrt(self.soc * (self.V_max ** 2 - self.V_min ** 2) + self.V_min ** 2)
 
-        self.voltage_history = []
-        self.state = 'idle'
+        self.state = IDLE
 
     # ==============================================================================
     # --- 新增：核心标准接口 update_state ---
@@ -148,7 +146,7 @@ class Supercapacitor(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
 
         # I = P / V
         current = power_elec / self.V_sc if self.V_sc > 1e-3 else self.rated_current_sc
@@ -169,7 +167,7 @@ class Supercapacitor(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
 
         current = power_elec / self.V_sc if self.V_sc > 1e-3 else 0
         current = min(current, self.rated_current_sc)
@@ -181,7 +179,7 @@ class Supercapacitor(BaseStorageModel):
 
     def idle_loss(self, time_s):
         """计算闲置时的自放电损耗，对应公式中的 sigma 项"""
-        self.state = 'idle'
+        self.state = IDLE
 
         # V(t) = V(0) * e^(-sigma*t) ~= V(0) * (1 - sigma*t)
         self.V_sc *= (1 - self.sigma * time_s)
@@ -11,7 +11,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # --- 修改区域 1: 导入正确的基类 ---
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, HistoryBuffer, IDLE, CHARGING, DISCHARGING
 
 
 # --- 修改区域 2: 让 CAES 继承 BaseStorageModel ---
@@ -39,7 +39,9 @@ class DiabaticCAES(BaseStorageModel):
 
                  # --- 其他关键参数 ---
                  soc_upper_limit=0.98,
-                 soc_lower_limit=0.2
+                 soc_lower_limit=0.2,
+                 # 历史记录预分配的步数 (超出后自动扩容)
+                 expected_steps=1024
                  ):
 
         # 1. 标准接口初始化
@@ -74,13 +76,19 @@ class DiabaticCAES(BaseStorageModel):
         # Max Air Mass (kg) = Rated Capacity (kWh) * Air Usage Rate (kg/kWh)
         # rated_capacity_mwh * 1000 -> kWh
         self.M_air_max = self.capacity_mwh * 1000 * self.eta_air_usage
+        # 额定功率发电一个仿真步长所消耗的空气质量 (kg)
+        self._air_kg_per_step_at_rated = (self.P_gen_rated_w / 1000) * self.eta_air_usage * (self.dt_s / 3600)
 
         # 5. 初始化核心状态变量：储气室空气质量 M_air (kg)
         self.M_air_kg = self.M_air_max * self.soc
 
-        self.mass_history = []
-        self.fuel_consumption_history_j = []
-        self.state = 'idle'
+        self._fuel_history = HistoryBuffer(expected_steps)
+        self.state = IDLE
+
+    @property
+    def fuel_consumption_history_j(self):
+        """每个时间步的燃料消耗 (J)"""
+        return self._fuel_history.values
 
     # ==============================================================================
     # --- 新增：核心标准接口 update_state ---
@@ -123,11 +131,12 @@ class DiabaticCAES(BaseStorageModel):
         # 受限于额定功率和剩余空气量
         # 可持续发电时长 (h) = 剩余可用空气质量 / (额定功率kW * 耗气率)
         available_air_kg = self.M_air_kg - self.M_air_max * self.soc_min
-        if self.P_gen_rated_w > 0 and self.eta_air_usage > 0:
-            duration_h = available_air_kg / ((self.P_gen_rated_w / 1000) * self.eta_air_usage)
+        if self._air_kg_per_step_at_rated > 0:
+            # 可持续时长与时间步长之比 = 剩余可用空气质量 / 额定功率下一个时间步的耗气量
+            duration_steps = available_air_kg / self._air_kg_per_step_at_rated
             # 如果可持续时长小于一个时间步，则按比例降低可用功率
-            if duration_h < (self.dt_s / 3600):
-                return duration_h * (3600 / self.dt_s) * self.P_gen_rated_w
+            if duration_steps < 1:
+                return duration_steps * self.P_gen_rated_w
 
         return self.P_gen_rated_w
 
@@ -138,12 +147,12 @@ class DiabaticCAES(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
         energy_consumed_kwh = (power_elec * time_s) / 3.6e6
         mass_stored_kg = energy_consumed_kwh * self.eta_charge_rate
         self.M_air_kg += mass_stored_kg
         self.M_air_kg = min(self.M_air_kg, self.M_air_max * self.soc_max)
-        self.fuel_consumption_history_j.append(0)
+        self._fuel_history.append(0)
 
     def discharge(self, power_elec, time_s):
         """按指定电功率放电 (发电)，并计算燃料消耗"""
@@ -152,7 +161,7 @@ class DiabaticCAES(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
         energy_generated_kwh = (power_elec * time_s) / 3.6e6
         mass_consumed_kg = energy_generated_kwh * self.eta_air_usage
 
@@ -171,12 +180,12 @@ class DiabaticCAES(BaseStorageModel):
         self.M_air_kg = max(self.M_air_kg, self.M_air_max * self.soc_min)
 
         fuel_consumed_kj = energy_generated_kwh * self.eta_heat_rate
-        self.fuel_consumption_history_j.append(fuel_consumed_kj * 1000)
+        self._fuel_history.append(fuel_consumed_kj * 1000)
 
     def idle_loss(self, time_s):
         """模拟闲置时的洞穴气体泄漏 (简化为无损)"""
-        self.state = 'idle'
-        self.fuel_consumption_history_j.append(0)
+        self.state = IDLE
+        self._fuel_history.append(0)
 
 
 # --- 单元测试代码 (保持不变) ---
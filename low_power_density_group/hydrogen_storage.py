@@ -10,7 +10,7 @@ import os
 # 将项目根目录添加到Python的模块搜索路径中
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, HistoryBuffer, IDLE, CHARGING, DISCHARGING
 
 # --- 物理常数 ---
 LHV_H2_KWH_PER_KG = 33.3  # 氢气低热值 (kWh/kg)
@@ -38,7 +38,9 @@ class HydrogenStorage(BaseStorageModel):
                  soc_upper_limit=0.95,
                  soc_lower_limit=0.05,
                  compressor_power_ratio=0.08,
-                 fc_heat_recovery_efficiency=0.35
+                 fc_heat_recovery_efficiency=0.35,
+                 # 历史记录预分配的步数 (超出后自动扩容)
+                 expected_steps=1024
                  ):
 
         # 1. 标准接口初始化
@@ -64,6 +66,9 @@ class HydrogenStorage(BaseStorageModel):
         self.P_fc_rated_w = self.power_m_w * 1e6
         self.eta_fc_elec = fc_elec_efficiency
         self.eta_fc_heat = fc_heat_recovery_efficiency
+        # 电解槽分得的功率比例 (1 - k)，以及每瓦总充电功率的制氢速率 (kg/h)，供充电时直接相乘
+        self._ely_power_share = 1 - self.compressor_ratio
+        self._ely_kg_per_h_per_w = self._ely_power_share / (1000 * self.eta_ely_kwh_kg)
 
         # 核心推算：根据能量公式 E = M_H2 * LHV, 反算储氢罐的最大质量容量
         energy_kwh = self.capacity_mwh * 1000
@@ -74,10 +79,17 @@ class HydrogenStorage(BaseStorageModel):
 
         # 4. 初始化核心状态变量：储氢质量 M_H2 (kg)
         self.M_H2_kg = self.M_tank_max * self.soc
+        # 闲置泄漏速率 (kg/s)：每天泄漏储罐容量的 0.01%
+        daily_loss_ratio = 0.0001
+        self._leak_kg_per_s = (self.M_tank_max * daily_loss_ratio) / (24 * 3600)
+
+        self._heat_power_history = HistoryBuffer(expected_steps)
+        self.state = IDLE
 
-        self.mass_history = []
-        self.heat_power_history = []
-        self.state = 'idle'
+    @property
+    def heat_power_history(self):
+        """每个时间步燃料电池伴生的热功率 (W)"""
+        return self._heat_power_history.values
 
     def update_state(self, dispatch_power_w):
         """
@@ -115,23 +127,21 @@ class HydrogenStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
 
-        compressor_power = power_elec * self.compressor_ratio
-        power_to_ely = power_elec - compressor_power
-        if power_to_ely <= 0:
+        # 扣除压缩机功耗后的电解功率 P * (1 - k) 才用于制氢
+        if self._ely_power_share <= 0:
             self.idle_loss(time_s)
             return
 
-        power_to_ely_kw = power_to_ely / 1000
         # <--- BUG修复：使用固定的效率参数 ---
-        m_dot_ely = power_to_ely_kw / self.eta_ely_kwh_kg  # kg/h
+        m_dot_ely = power_elec * self._ely_kg_per_h_per_w  # kg/h
 
         time_h = time_s / 3600.0
         self.M_H2_kg += m_dot_ely * time_h
         self.M_H2_kg = min(self.M_H2_kg, self.M_tank_max * self.soc_max)
 
-        self.heat_power_history.append(0)
+        self._heat_power_history.append(0)
 
     def discharge(self, power_elec, time_s):
         """按指定电功率放电 (发电)，并计算伴生的热功率"""
@@ -140,7 +150,7 @@ class HydrogenStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
         power_elec_kw = power_elec / 1000
         time_h = time_s / 3600.0
 
@@ -163,16 +173,14 @@ class HydrogenStorage(BaseStorageModel):
         self.M_H2_kg = max(self.M_H2_kg, self.M_tank_max * self.soc_min)
 
         power_heat = power_elec * (self.eta_fc_heat / self.eta_fc_elec)
-        self.heat_power_history.append(power_heat)
+        self._heat_power_history.append(power_heat)
 
     def idle_loss(self, time_s):
         """模拟闲置时的氢气泄漏"""
-        self.state = 'idle'
-        daily_loss_ratio = 0.0001
-        loss_per_second_kg = (self.M_tank_max * daily_loss_ratio) / (24 * 3600)
-        self.M_H2_kg -= loss_per_second_kg * time_s
+        self.state = IDLE
+        self.M_H2_kg -= self._leak_kg_per_s * time_s
         self.M_H2_kg = max(self.M_H2_kg, self.M_tank_max * self.soc_min)
-        self.heat_power_history.append(0)
+        self._heat_power_history.append(0)
 
 
 # --- 单元测试代码 (保持不变) ---
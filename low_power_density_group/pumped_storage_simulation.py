@@ -1,7 +1,6 @@
 # file: low_power_density_group/pumped_storage_simulation.py (统一接口修改版 V1.0)
 
 import math
-import numpy as np
 
 # 解决在子文件夹中导入父文件夹模块的问题
 import sys
@@ -11,7 +10,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # --- 修改区域 1: 导入正确的基类 ---
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, IDLE, CHARGING, DISCHARGING
 
 # --- 物理常数 ---
 WATER_DENSITY_KG_M3 = 1000
@@ -50,7 +49,7 @@ class PumpedHydroStorage(BaseStorageModel):
         self.soc = initial_soc
         self.power_m_w = rated_power_mw  # 以发电功率作为额定功率
         self.capacity_mwh = rated_capacity_mwh
-        self.efficiency = np.sqrt(turbine_efficiency * pump_efficiency)
+        self.efficiency = math.sqrt(turbine_efficiency * pump_efficiency)
         self.soc_min = soc_lower_limit
         self.soc_max = soc_upper_limit
         self.om_cost_per_mwh = om_cost_per_mwh
@@ -80,8 +79,7 @@ class PumpedHydroStorage(BaseStorageModel):
         # 4. 初始化核心状态变量：上水库水量 V_ur
         self.V_ur_m3 = self.V_ur_min + self.soc * (self.V_ur_max - self.V_ur_min)
 
-        self.volume_history = []
-        self.state = 'idle'
+        self.state = IDLE
 
     # ==============================================================================
     # --- 新增：核心标准接口 update_state ---
@@ -130,8 +128,8 @@ class PumpedHydroStorage(BaseStorageModel):
             self.V_ur_m3 += delta_volume
         else:
             self.V_ur_m3 -= delta_volume
-        # 应用水量约束
-        self.V_ur_m3 = np.clip(self.V_ur_m3, self.V_ur_min, self.V_ur_max)
+        # 应用水量约束 (标量限幅用内置 min/max，避免 np.clip 对单个浮点数的数组开销)
+        self.V_ur_m3 = min(max(self.V_ur_m3, self.V_ur_min), self.V_ur_max)
 
     def get_available_charge_power(self):
         """获取当前可用的充电功率 (W)"""
@@ -150,7 +148,7 @@ class PumpedHydroStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
         flow_rate = self._power_to_flow(power_elec, is_charging=True)
         self._update_volume(flow_rate, time_s, is_charging=True)
 
@@ -161,13 +159,13 @@ class PumpedHydroStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
         flow_rate = self._power_to_flow(power_elec, is_charging=False)
         self._update_volume(flow_rate, time_s, is_charging=False)
 
     def idle_loss(self, time_s):
         """简化模型，抽水蓄能闲置时无损耗"""
-        self.state = 'idle'
+        self.state = IDLE
         # 水量不发生变化
 
 
@@ -11,7 +11,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # --- 修改区域 1: 导入正确的基类 ---
-from base_storage_model import BaseStorageModel
+from base_storage_model import BaseStorageModel, IDLE, CHARGING, DISCHARGING
 
 
 # --- 修改区域 2: 让 TES 继承 BaseStorageModel ---
@@ -91,10 +91,10 @@ class ThermalEnergyStorage(BaseStorageModel):
 
         # 5. 初始化核心状态变量：储存的热量 H_tes (单位: 焦耳)
         self.H_tes_J = self.H_tes_max_J * self.soc
+        # 散热功率 (W)：每秒损失最大储热量的 theta_loss
+        self._heat_loss_w = self.H_tes_max_J * self.theta_loss
 
-        self.energy_history = []
-        self.temp_history = []
-        self.state = 'idle'
+        self.state = IDLE
 
     # ==============================================================================
     # --- 新增：核心标准接口 update_state ---
@@ -147,7 +147,7 @@ class ThermalEnergyStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'charging'
+        self.state = CHARGING
         power_heat_in = power_elec * self.eta_e2h
         delta_heat = power_heat_in * time_s
         self.H_tes_J += delta_heat
@@ -162,7 +162,7 @@ class ThermalEnergyStorage(BaseStorageModel):
             self.idle_loss(time_s)
             return
 
-        self.state = 'discharging'
+        self.state = DISCHARGING
         power_heat_out = power_elec / self.eta_h2e
         delta_heat = power_heat_out * time_s
 
@@ -179,10 +179,10 @@ class ThermalEnergyStorage(BaseStorageModel):
     def idle_loss(self, time_s):
         """模拟闲置时的散热损失"""
         # 只有在充电和放电之外的状态才标记为idle
-        if self.state not in ['charging', 'discharging']:
-            self.state = 'idle'
+        if self.state not in (CHARGING, DISCHARGING):
+            self.state = IDLE
 
-        lost_heat = self.H_tes_max_J * self.theta_loss * time_s
+        lost_heat = self._heat_loss_w * time_s
         self.H_tes_J -= lost_heat
         self.H_tes_J = max(0, self.H_tes_J)
 
@@ -0,0 +1,127 @@
+# file: mpc_common.py
+# 备注：各 MPC 能量管理模块 (单层 / 分层确定性 / 分层随机) 共用的求解辅助函数。
+
+import os
+
+import cvxpy as cp
+import numpy as np
+import pywt
+from numpy.lib.stride_tricks import sliding_window_view
+
+# numba 为可选依赖：安装时 optional_jit 将函数 JIT 编译，未安装时原样返回，按普通 NumPy 执行
+try:
+    from numba import njit
+
+    optional_jit = njit(cache=True, fastmath=True)
+except ImportError:
+    def optional_jit(func):
+        return func
+
+
+def configure_cvxpy_threads():
+    """
+    允许 CVXPY 多线程进行问题规范化 (canonicalization)。设置了 OMP_NUM_THREADS 时使用该线程数，
+    避免规范化与基于 OpenMP 的求解器争抢 CPU 核心。
+    """
+    if hasattr(cp, "set_num_threads"):  # 较旧的 CVXPY 版本没有该接口
+        cp.set_num_threads(int(os.environ.get("OMP_NUM_THREADS", os.cpu_count() or 1)))
+
+
+def shift_warm_start(problem, skip=()):
+    """
+    将上一步的最优轨迹沿最后一维 (时间维) 前移一步 (x_0^{k+1} <- x_1^{k*})，末尾沿用最后一个值，
+    使初始解与滚动时域的推进保持一致。skip 中的变量 (如一个元素对应多个时间步的分块变量) 保持原值。
+    """
+    skip_ids = {var.id for var in skip}
+    for var in problem.variables():
+        if var.id in skip_ids:
+            continue
+        if var.value is not None and var.ndim >= 1 and var.shape[-1] > 1:
+            value = var.value
+            var.project_and_assign(np.concatenate((value[..., 1:], value[..., -1:]), axis=-1))
+
+
+def create_gurobi_env():
+    """创建一个供所有求解复用的 Gurobi 环境，避免每次求解都重新建立环境/校验许可；Gurobi 不可用时返回 None。"""
+    try:
+        import gurobipy
+    except ImportError:
+        return None
+    try:
+        return gurobipy.Env()
+    except gurobipy.GurobiError:
+        return None
+
+
+def solve_in_order(problem, attempts, warm_start=True):
+    """
+    依次用 attempts 中的 (求解器, 求解选项) 求解 problem，直到得到最优解，返回是否成功。
+    求解器未安装或求解出错 (SolverError) 时继续尝试下一个。
+    """
+    for solver, options in attempts:
+        try:
+            problem.solve(solver=solver, verbose=False, warm_start=warm_start, **options)
+        except cp.error.SolverError:
+            continue
+        if problem.status in ["optimal", "optimal_inaccurate"]:
+            return True
+    return False
+
+
+def forecast_windows(series, horizon):
+    """
+    一次性生成所有时刻的预测窗口 (只读视图，不复制数据)：第 k 行即 series[k: k + horizon]，
+    末尾不足的部分用最后一个值补齐，与逐步切片后 np.pad(..., 'edge') 的结果一致。
+    """
+    padded = np.concatenate([series, np.full(horizon - 1, series[-1])])
+    return sliding_window_view(padded, horizon)
+
+
+def decompose_power_signal(power_signal, wavelet='db4', level=3):
+    """
+    使用小波包变换将功率信号分解为不同频段的子信号。
+    """
+    power_signal = np.asarray(power_signal, dtype=float)
+    original_len = len(power_signal)
+
+    # 快速路径：常数信号的小波包分解结果是解析已知的（能量全部位于最低频节点），
+    # 直接返回，避免构建和重构小波包树
+    if original_len > 0 and np.ptp(power_signal) == 0:
+        return {"low": power_signal.astype(float),
+                "mid": np.zeros(original_len), "high": np.zeros(original_len)}
+
+    # 按频率排序的第 level 层小波包节点中，低频取前 2 个、中频取第 3~4 个、其余为高频，
+    # 它们恰好分别对应第 level-1 层离散小波分解的近似系数、最深一层细节系数和其余各层细节系数。
+    # 因此只需做 level-1 层离散小波分解，再对各频带系数 (其余置零) 分别 waverec，无需构建和重构小波包树。
+    # 逐层调用 pywt.dwt：短信号 (db4 下少于 28 个点) 超过 pywt.dwt_max_level 时 wavedec 会发出警告，
+    # 而按该上限截断层数又会改变频带划分；逐层 dwt 与原小波包分解一致，且不产生警告。
+    coeffs = []
+    approx = power_signal
+    for _ in range(level - 1):
+        approx, detail = pywt.dwt(approx, wavelet, mode='symmetric')
+        coeffs.insert(0, detail)
+    coeffs.insert(0, approx)
+
+    def reconstruct_band(band_indices):
+        band_coeffs = [c if i in band_indices else np.zeros_like(c) for i, c in enumerate(coeffs)]
+        return pywt.waverec(band_coeffs, wavelet, mode='symmetric')[:original_len]
+
+    return {
+        "low": reconstruct_band({0}),
+        "mid": reconstruct_band({1}),
+        "high": reconstruct_band(set(range(2, len(coeffs))))
+    }
+
+
+def resample_upper_plan(plan_matrix, fractions):
+    """
+    将上层计划矩阵 (每行一条计划) 一次性线性插值到给定的相对位置 (取值 0~1)。
+    结果与逐行调用 np.interp(fraction, np.linspace(0, 1, n, endpoint=False), plan) 一致。
+    """
+    plan_matrix = np.atleast_2d(plan_matrix)
+    n = plan_matrix.shape[1]
+    x = np.asarray(fractions, dtype=float) * n
+    left = np.minimum(np.floor(x).astype(int), n - 1)
+    right = np.minimum(left + 1, n - 1)
+    weight = x - left
+    return plan_matrix[:, left] * (1 - weight) + plan_matrix[:, right] * weight
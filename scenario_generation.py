@@ -4,7 +4,6 @@ import numpy as np
 from scipy.stats.qmc import LatinHypercube
 from scipy.stats import norm
 from sklearn.cluster import KMeans
-import matplotlib.pyplot as plt
 
 
 def generate_scenarios(num_samples, num_scenarios, mean, cov_matrix):
@@ -68,6 +67,9 @@ def plot_scenarios(initial_samples, reduced_scenarios, probabilities):
         print("警告: 只能对二维数据进行可视化。")
         return
 
+    # 仅在绘图时才导入 matplotlib，只调用 generate_scenarios 的模块 (如随机MPC仿真) 无需承担其导入开销
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 8))
     # 绘制初始样本点
     plt.scatter(initial_samples[:, 0], initial_samples[:, 1], c='lightblue', alpha=0.5,